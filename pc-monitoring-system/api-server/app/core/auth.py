@@ -1,19 +1,91 @@
-from jose import JWTError, jwt
+import jwt
 from passlib.context import CryptContext
+from cachetools import TTLCache
 from datetime import datetime, timedelta
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import bindparam, lambda_stmt, select
 from sqlalchemy.orm import Session
+from typing import NamedTuple
+import asyncio
+import hashlib
+import threading
+import time
 
 from .config import settings
-from ..models.database import get_db, User
+from ..models.database import get_db, User, Manager
 
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# argon2 como esquema por defecto (verificación más rápida a seguridad
+# equivalente). bcrypt_sha256 pre-hashea con SHA-256, así los passphrases
+# largos no sufren el truncado de bcrypt a 72 bytes; los hashes bcrypt
+# legados se siguen verificando y passlib los re-hashea en el próximo login.
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt_sha256", "bcrypt"],
+    deprecated=["bcrypt"],
+)
+
+# Cache de payloads JWT ya verificados para no repetir jwt.decode en cada request.
+# El TTL corto garantiza que un token expirado nunca sobreviva en el cache.
+_payload_cache = TTLCache(maxsize=10000, ttl=60)
+_payload_cache_lock = threading.Lock()
+
+# Cache corto del usuario autenticado para evitar un round-trip a la base
+# de datos en cada request. Se guarda un snapshot liviano (no la instancia
+# ligada a la sesión de SQLAlchemy).
+_user_cache = TTLCache(maxsize=5000, ttl=60)
+_user_cache_lock = threading.Lock()
+
+# user_id -> manager_id: la relación nunca cambia una vez creada, así que un
+# TTL largo elimina el SELECT idéntico que abría cada endpoint de gerente
+_manager_id_cache = TTLCache(maxsize=5000, ttl=300)
+_manager_id_cache_lock = threading.Lock()
+
+class CachedUser(NamedTuple):
+    id: object
+    email: str
+    role: object
+
+# Statements calientes construidos una sola vez: lambda_stmt cachea el árbol
+# de expresión y su SQL compilado, así cada request solo liga parámetros
+_USER_BY_ID = lambda_stmt(
+    lambda: select(User).where(User.id == bindparam("uid"))
+)
+_MANAGER_ID_BY_USER = lambda_stmt(
+    lambda: select(Manager.id).where(Manager.user_id == bindparam("uid"))
+)
+
+def invalidate_user_cache(user_id):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+    with _manager_id_cache_lock:
+        _manager_id_cache.pop(user_id, None)
+
+def get_manager_id(db: Session, user_id):
+    """Resuelve el manager_id del usuario, cacheado; None si no es gerente."""
+    with _manager_id_cache_lock:
+        cached = _manager_id_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    row = db.execute(_MANAGER_ID_BY_USER, {"uid": user_id}).first()
+    if row is None:
+        return None
+
+    with _manager_id_cache_lock:
+        _manager_id_cache[user_id] = row[0]
+    return row[0]
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+async def verify_password_async(plain_password, hashed_password):
+    # El hashing es CPU-bound (~100 ms); ejecutarlo en un thread para no
+    # bloquear el event loop durante logins concurrentes
+    return await asyncio.get_running_loop().run_in_executor(
+        None, pwd_context.verify, plain_password, hashed_password
+    )
+
 def get_password_hash(password):
     return pwd_context.hash(password)
 
@@ -28,29 +100,82 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 def verify_token(token: str):
+    cache_key = hashlib.sha256(token.encode()).digest()[:16]
+    with _payload_cache_lock:
+        payload = _payload_cache.get(cache_key)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Solo cachear si el token sigue vigente más allá del TTL del cache.
+    # exp es un epoch UTC: compararlo contra time.time() (utcnow().timestamp()
+    # reinterpreta la hora UTC como local y corre el umbral)
+    exp = payload.get("exp")
+    if exp and exp > time.time() + _payload_cache.ttl:
+        with _payload_cache_lock:
+            _payload_cache[cache_key] = payload
+
+    return payload
+
 def get_current_user(db: Session, user_id: str):
-    user = db.query(User).filter(User.id == user_id).first()
+    with _user_cache_lock:
+        cached = _user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    user = db.execute(_USER_BY_ID, {"uid": user_id}).scalar_one_or_none()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuario no encontrado"
         )
-    return user
 
-async def get_current_user_dependency(
+    snapshot = CachedUser(id=user.id, email=user.email, role=user.role)
+    with _user_cache_lock:
+        _user_cache[user_id] = snapshot
+
+    return snapshot
+
+def get_current_user_dependency(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
+    # Memoizar dentro del request: si varias dependencias del mismo endpoint
+    # piden el usuario, el token se decodifica una sola vez
+    user = getattr(request.state, "current_user", None)
+    if user is not None:
+        return user
+
     payload = verify_token(credentials.credentials)
     user = get_current_user(db, payload["sub"])
-    return user
\ No newline at end of file
+    request.state.current_user = user
+    return user
+
+def require_role(role_name: str):
+    """Construye una dependencia que exige el rol dado.
+
+    Corta con 403 en la capa de dependencias, antes de que el handler
+    ejecute ninguna consulta propia; los handlers reciben el usuario ya
+    verificado y se ahorran el if repetido.
+    """
+    def dependency(current_user=Depends(get_current_user_dependency)):
+        if current_user.role.value != role_name:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Operación permitida solo para el rol {role_name}"
+            )
+        return current_user
+    return dependency
+
+require_manager = require_role("GERENTE")
+require_agent = require_role("AGENTE")
+require_admin = require_role("ADMINISTRADOR")
\ No newline at end of file
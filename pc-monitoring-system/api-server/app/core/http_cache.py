@@ -0,0 +1,16 @@
+import hashlib
+
+# Los dashboards sondean los listados cada pocos segundos; un max-age corto
+# con revalidación obligatoria mantiene la frescura sin repetir la
+# serialización completa cuando nada cambió
+CACHE_CONTROL = "private, max-age=30, must-revalidate"
+
+
+def make_etag(*parts) -> str:
+    """Construye un ETag débil a partir del estado que resume la respuesta.
+
+    Las partes suelen ser el manager_id más conteos y timestamps máximos:
+    cualquier inserción o actualización relevante cambia alguno de ellos.
+    """
+    raw = ":".join(str(part) for part in parts)
+    return 'W/"' + hashlib.sha256(raw.encode()).hexdigest()[:20] + '"'
@@ -0,0 +1,85 @@
+"""
+Almacén de tokens de un solo uso compartido entre workers.
+
+Con varios workers de Uvicorn, un token creado en el worker A era invisible
+para el worker B porque vivía en un dict del proceso. Si settings.redis_url
+está configurado, los tokens se guardan en Redis (SET con EX, GETDEL para
+lecturas de un solo uso) y son visibles para todos los workers; sin Redis se
+usa un TTLCache en memoria como fallback para desarrollo de un solo proceso.
+
+Los tokens autorizan acciones sensibles (creación de cuentas, lectura de
+escaneos), así que se tratan como secretos: la clave de almacenamiento es el
+SHA-256 del token y la igualdad final se verifica con hmac.compare_digest
+para no filtrar información por timing.
+"""
+
+import hashlib
+import hmac
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from .config import settings
+
+class TokenStore:
+
+    def __init__(self, prefix: str, ttl: int, maxsize: int = 100000):
+        self.prefix = prefix
+        self.ttl = ttl
+        self._redis = None
+        if settings.redis_url and redis is not None:
+            self._redis = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.RLock()
+
+    def _key(self, token: str) -> str:
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        return f"v1:{self.prefix}:{digest}"
+
+    def _unwrap(self, entry: Optional[Dict[str, Any]], token: str) -> Optional[Dict[str, Any]]:
+        if entry is None:
+            return None
+        if not hmac.compare_digest(entry["token"], token):
+            return None
+        return entry["data"]
+
+    def set(self, token: str, data: Dict[str, Any]):
+        entry = {"token": token, "data": data}
+        if self._redis is not None:
+            self._redis.set(self._key(token), json.dumps(entry, default=str), ex=self.ttl)
+        else:
+            with self._lock:
+                self._cache[self._key(token)] = entry
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        if self._redis is not None:
+            raw = self._redis.get(self._key(token))
+            entry = json.loads(raw) if raw else None
+        else:
+            with self._lock:
+                entry = self._cache.get(self._key(token))
+        return self._unwrap(entry, token)
+
+    def pop(self, token: str) -> Optional[Dict[str, Any]]:
+        """Obtiene e invalida el token en una sola operación (GETDEL en Redis)."""
+        if self._redis is not None:
+            raw = self._redis.getdel(self._key(token))
+            entry = json.loads(raw) if raw else None
+        else:
+            with self._lock:
+                entry = self._cache.pop(self._key(token), None)
+        return self._unwrap(entry, token)
+
+    def delete(self, token: str):
+        if self._redis is not None:
+            self._redis.delete(self._key(token))
+        else:
+            with self._lock:
+                self._cache.pop(self._key(token), None)
@@ -1,13 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from .core.config import settings
+from .core.auth import pwd_context, create_access_token
 from .routers import auth, agent, admin, dashboard, machines, threats, powerbi, scans, invitations
 
 app = FastAPI(
     title="PC Monitoring System API",
     description="API RESTful para sistema de monitoreo de PCs",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configurar CORS
@@ -30,6 +33,17 @@ app.include_router(powerbi.router, prefix="/api/v1")
 app.include_router(scans.router, prefix="/api/v1")
 app.include_router(invitations.router, prefix="/api/v1")
 
+@app.on_event("startup")
+async def warmup():
+    # Cargar los backends perezosos (argon2/bcrypt de passlib, HMAC de PyJWT)
+    # al arrancar, para que el primer login no pague el costo de importación
+    pwd_context.hash("warmup")
+    create_access_token({"sub": "warmup"})
+
+@app.on_event("shutdown")
+async def shutdown():
+    await powerbi.shutdown_http_client()
+
 @app.get("/")
 async def root():
     return {
@@ -1,11 +1,11 @@
 from .database import (
     User, Manager, Machine, Scan, Threat,
-    UserRole, ThreatStatus, InvitationStatus,
+    UserRole, ThreatStatus, ThreatLevel, InvitationStatus,
     get_db, Base, engine
 )
 
 __all__ = [
     "User", "Manager", "Machine", "Scan", "Threat",
-    "UserRole", "ThreatStatus", "InvitationStatus",
+    "UserRole", "ThreatStatus", "ThreatLevel", "InvitationStatus",
     "get_db", "Base", "engine"
 ]
\ No newline at end of file
@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, Text, Enum as SQLEnum, Boolean
+from sqlalchemy import create_engine, Column, String, DateTime, Integer, Text, Enum as SQLEnum, Boolean, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
 from datetime import datetime
@@ -8,15 +8,47 @@ import enum
 
 from ..core.config import settings
 
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Backend elegido según database_url: PostgreSQL en producción, SQLite para
+# pruebas locales. Un solo árbol de modelos sirve a ambos (antes había una
+# copia completa en database_temp.py con enums que no coincidían).
+_IS_SQLITE = settings.database_url.startswith("sqlite")
+
+if _IS_SQLITE:
+    engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False}
+    )
+    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    GUID = String(36)
+    JSONType = JSON
+else:
+    # Pool dimensionado para el tráfico de agentes + dashboard: el default
+    # (5 conexiones) hace cola bajo carga. pool_pre_ping descarta conexiones
+    # muertas y pool_recycle evita que el servidor las corte por inactividad.
+    engine = create_engine(
+        settings.database_url,
+        pool_size=20,
+        max_overflow=40,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    GUID = UUID(as_uuid=True)
+    JSONType = JSONB
+
+def _uuid_default():
+    return str(uuid.uuid4()) if _IS_SQLITE else uuid.uuid4()
+
+# expire_on_commit=False evita el SELECT de refresco cuando un handler lee
+# atributos del objeto recién confirmado (p.ej. scan.id tras el commit)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 class UserRole(enum.Enum):
-    ADMIN = "ADMIN"
+    PROSPECTO = "PROSPECTO"
     GERENTE = "GERENTE"
     AGENTE = "AGENTE"
-    USUARIO = "USUARIO"
+    ADMINISTRADOR = "ADMINISTRADOR"
 
 class ThreatStatus(enum.Enum):
     NUEVA = "NUEVA"
@@ -36,63 +68,111 @@ class InvitationStatus(enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    id = Column(GUID, primary_key=True, default=_uuid_default)
+    name = Column(String(100))
     email = Column(String(255), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
-    role = Column(SQLEnum(UserRole), nullable=False, default=UserRole.USUARIO)
+    role = Column(SQLEnum(UserRole), nullable=False, default=UserRole.PROSPECTO)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
 class Manager(Base):
     __tablename__ = "managers"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), nullable=False)
+
+    id = Column(GUID, primary_key=True, default=_uuid_default)
+    user_id = Column(GUID, nullable=False)
     company_name = Column(String(255), nullable=False)
+    powerbi_access_token = Column(Text, nullable=True)
+    powerbi_refresh_token = Column(Text, nullable=True)
+    powerbi_connected_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
 class Machine(Base):
     __tablename__ = "machines"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    manager_id = Column(UUID(as_uuid=True), nullable=False)
+
+    id = Column(GUID, primary_key=True, default=_uuid_default)
+    manager_id = Column(GUID, nullable=False)
     hardware_id = Column(String(255), unique=True, nullable=False)
     name = Column(String(255))  # hostname del sistema
     friendly_name = Column(String(255))  # nombre amigable asignado por el gerente
-    inventory_data = Column(JSONB)
+    status = Column(String(50), nullable=False, default="ACTIVE")
+    # Denormalizados y mantenidos por receive_scan_data: evita COUNT(*) y
+    # "último escaneo" por máquina al listar
+    scan_count = Column(Integer, nullable=False, default=0)
+    last_seen = Column(DateTime, nullable=True)
+    last_status = Column(String(50), nullable=True)
+    inventory_data = Column(JSONType)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # onupdate permite que los ETags de listados detecten renombres
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Toda consulta de dashboard/máquinas filtra por manager_id; el índice
+    # único (manager_id, name) es el objetivo del UPSERT de receive_scan_data
+    __table_args__ = (
+        Index("ix_machines_manager", manager_id),
+        Index("ux_machines_manager_name", manager_id, name, unique=True),
+    )
 
 class Scan(Base):
     __tablename__ = "scans"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    machine_id = Column(UUID(as_uuid=True), nullable=False)
+
+    id = Column(GUID, primary_key=True, default=_uuid_default)
+    machine_id = Column(GUID, nullable=False)
     scan_timestamp = Column(DateTime, nullable=False)
-    performance_data = Column(JSONB)
+    status = Column(String(50), nullable=False, default="COMPLETED")
+    # Fijado al ingestar el escaneo; las amenazas referencian a la máquina,
+    # no al escaneo, así que el conteo no puede derivarse con un join
+    threats_detected = Column(Integer, nullable=False, default=0)
+    scan_data = Column(JSONType)
+    performance_data = Column(JSONType)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
+    # Soporta el "último escaneo por máquina" (ORDER BY scan_timestamp DESC)
+    __table_args__ = (
+        Index("ix_scans_machine_ts", machine_id, scan_timestamp.desc()),
+    )
+
 class Threat(Base):
     __tablename__ = "threats"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    machine_id = Column(UUID(as_uuid=True), nullable=False)
+
+    id = Column(GUID, primary_key=True, default=_uuid_default)
+    machine_id = Column(GUID, nullable=False)
     threat_type = Column(String(100), nullable=False)
     level = Column(SQLEnum(ThreatLevel), nullable=False, default=ThreatLevel.MEDIUM)
     description = Column(Text, nullable=False)
-    details = Column(JSONB)  # detalles técnicos de la amenaza
+    details = Column(JSONType)  # detalles técnicos de la amenaza
     status = Column(SQLEnum(ThreatStatus), nullable=False, default=ThreatStatus.NUEVA)
     resolved = Column(Boolean, nullable=False, default=False)
-    evidence = Column(JSONB)  # evidencia de la detección
+    evidence = Column(JSONType)  # evidencia de la detección
     detected_at = Column(DateTime, nullable=False)
     resolved_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # onupdate permite que los ETags de listados detecten resoluciones
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # primaryjoin explícito porque las columnas no declaran ForeignKey;
+    # lazy="raise" obliga a cargarla con contains_eager/joinedload y evita
+    # que un acceso descuidado reintroduzca un N+1
+    machine = relationship(
+        "Machine",
+        primaryjoin="foreign(Threat.machine_id) == Machine.id",
+        viewonly=True,
+        lazy="raise",
+    )
+
+    # Los filtros del dashboard combinan machine_id + resolved + level,
+    # la ventana de amenazas recientes filtra por detected_at, y el listado
+    # de amenazas ordena por detected_at DESC dentro de cada máquina
+    __table_args__ = (
+        Index("ix_threats_machine_resolved_level", machine_id, resolved, level),
+        Index("ix_threats_detected_at", detected_at),
+        Index("ix_threats_machine_detected", machine_id, detected_at.desc(), resolved),
+    )
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
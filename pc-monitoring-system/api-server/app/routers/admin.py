@@ -1,50 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from typing import List
-from pydantic import BaseModel
+from datetime import datetime
+from uuid import UUID
+from pydantic import BaseModel, ConfigDict, field_serializer
 
 from ..models.database import get_db, User, UserRole
-from ..core.auth import get_current_user_dependency
+from ..core.auth import require_admin, invalidate_user_cache
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 class UserResponse(BaseModel):
-    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+    # El modelo unificado usa claves primarias GUID (UUID en Postgres,
+    # str en SQLite); UUID acepta ambas representaciones
+    id: UUID
     name: str
     email: str
     role: UserRole
-    created_at: str
-    
-    class Config:
-        from_attributes = True
+    created_at: datetime
+
+    @field_serializer("created_at")
+    def _serialize_created_at(self, value: datetime) -> str:
+        return value.isoformat()
 
 class RoleUpdateRequest(BaseModel):
     role: UserRole
 
 @router.get("/users", response_model=List[UserResponse])
-async def get_all_users(
-    current_user: User = Depends(get_current_user_dependency),
+def get_all_users(
+    current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    if current_user.role != UserRole.ADMINISTRADOR:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los administradores pueden acceder a esta función"
-        )
-    
     try:
-        users = db.query(User).all()
-        return [
-            UserResponse(
-                id=user.id,
-                name=user.name,
-                email=user.email,
-                role=user.role,
-                created_at=user.created_at.isoformat()
-            )
-            for user in users
-        ]
-        
+        # Cargar solo las columnas del response y dejar que Pydantic
+        # serialice directamente desde los atributos del ORM
+        return db.query(User).options(
+            load_only(User.id, User.name, User.email, User.role, User.created_at)
+        ).all()
+
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -52,18 +47,12 @@ async def get_all_users(
         )
 
 @router.put("/users/{user_id}/role")
-async def update_user_role(
-    user_id: int,
+def update_user_role(
+    user_id: str,
     role_update: RoleUpdateRequest,
-    current_user: User = Depends(get_current_user_dependency),
+    current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    if current_user.role != UserRole.ADMINISTRADOR:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los administradores pueden cambiar roles de usuario"
-        )
-    
     try:
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
@@ -81,6 +70,9 @@ async def update_user_role(
         old_role = user.role
         user.role = role_update.role
         db.commit()
+
+        # Invalidar el snapshot cacheado para que el nuevo rol aplique de inmediato
+        invalidate_user_cache(user.id)
         
         return {
             "message": f"Rol actualizado exitosamente de {old_role.value} a {role_update.role.value}",
@@ -1,36 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-import io
 import secrets
-from datetime import datetime
+import time
 
-from ..core.auth import get_current_user_dependency
-from ..models.database import get_db, Manager, User, Scan, Machine
+from ..core.auth import get_manager_id, require_agent, require_manager
+from ..core.token_store import TokenStore
+from ..models.database import get_db, User, Scan, Machine
 from ..services import AgentPackager
 
 router = APIRouter(prefix="/agent", tags=["agent"])
 
 @router.get("/download")
-async def download_agent(
+def download_agent(
     package_type: str = Query("python"),
-    current_user: User = Depends(get_current_user_dependency),
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden descargar el agente"
-        )
-    
     if package_type not in ["python", "executable"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Tipo de paquete debe ser 'python' o 'executable'"
         )
     
-    manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-    if not manager:
+    manager_id = get_manager_id(db, current_user.id)
+    if not manager_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Perfil de gerente no encontrado"
@@ -40,14 +33,17 @@ async def download_agent(
         packager = AgentPackager()
         
         if package_type == "executable":
-            package_data = packager.create_executable_package(str(manager.id))
-            filename = f"pc_monitor_agent_executable_{manager.id}.zip"
+            package_data = packager.create_executable_package(str(manager_id))
+            filename = f"pc_monitor_agent_executable_{manager_id}.zip"
         else:
-            package_data = packager.create_agent_package(str(manager.id))
-            filename = f"pc_monitor_agent_python_{manager.id}.zip"
+            package_data = packager.create_agent_package(str(manager_id))
+            filename = f"pc_monitor_agent_python_{manager_id}.zip"
         
-        return StreamingResponse(
-            io.BytesIO(package_data),
+        # Los paquetes ya están completos en memoria: una Response directa
+        # los manda en un solo cuerpo con Content-Length, sin el troceo por
+        # chunks (y sus idas al event loop) de StreamingResponse sobre BytesIO
+        return Response(
+            content=package_data,
             media_type="application/zip",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -59,18 +55,12 @@ async def download_agent(
         )
 
 @router.get("/check-task")
-async def check_agent_task(
+def check_agent_task(
     machine_id: str = Query(...),
-    current_user: User = Depends(get_current_user_dependency),
+    current_user: User = Depends(require_agent),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "AGENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los agentes pueden consultar tareas"
-        )
-    
-    machine = db.query(Machine).filter(Machine.machine_id == machine_id).first()
+    machine = db.query(Machine).filter(Machine.hardware_id == machine_id).first()
     if not machine:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -85,28 +75,24 @@ async def check_agent_task(
         "config_update": None
     }
 
-scan_tokens = {}
+# Compartido entre workers vía Redis cuando settings.redis_url está configurado
+scan_tokens = TokenStore("scan", ttl=3600)
 
 @router.get("/scan-result/{scan_token}")
-async def get_scan_result(
+def get_scan_result(
     scan_token: str,
     db: Session = Depends(get_db)
 ):
-    if scan_token not in scan_tokens:
+    # pop atómico (GETDEL en Redis): dos requests concurrentes con el mismo
+    # token no pueden pasar ambos la validación
+    token_data = scan_tokens.pop(scan_token)
+
+    if token_data is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Token de escaneo inválido o expirado"
         )
-    
-    token_data = scan_tokens[scan_token]
-    
-    if (datetime.utcnow() - token_data["created_at"]).seconds > 3600:
-        del scan_tokens[scan_token]
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Token de escaneo expirado"
-        )
-    
+
     scan = db.query(Scan).filter(Scan.id == token_data["scan_id"]).first()
     if not scan:
         raise HTTPException(
@@ -114,20 +100,20 @@ async def get_scan_result(
             detail="Escaneo no encontrado"
         )
     
-    del scan_tokens[scan_token]
-    
+    machine = db.query(Machine).filter(Machine.id == scan.machine_id).first()
+
     return {
         "scan_id": scan.id,
-        "scan_date": scan.scan_date,
-        "machine_name": scan.machine.machine_name,
+        "scan_date": scan.scan_timestamp,
+        "machine_name": machine.name if machine else None,
         "scan_data": scan.scan_data,
         "status": "completed"
     }
 
 def create_scan_token(scan_id: str) -> str:
     token = secrets.token_urlsafe(32)
-    scan_tokens[token] = {
+    scan_tokens.set(token, {
         "scan_id": scan_id,
-        "created_at": datetime.utcnow()
-    }
+        "created_at": time.time()
+    })
     return token
\ No newline at end of file
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import bindparam, lambda_stmt, select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 
-from ..core.auth import verify_password, create_access_token, get_password_hash
-from ..models.database import get_db, User
+from ..core.auth import verify_password_async, create_access_token, get_password_hash
+from ..models.database import get_db, User, UserRole
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -22,8 +23,15 @@ class Token(BaseModel):
     token_type: str
     user_role: str
 
+# Construido y compilado una sola vez; cada login solo liga el email
+_LOGIN_STMT = lambda_stmt(
+    lambda: select(User.id, User.email, User.password_hash, User.role).where(
+        User.email == bindparam("email")
+    )
+)
+
 @router.post("/register")
-async def register_user(
+def register_user(
     user_data: UserRegister,
     db: Session = Depends(get_db)
 ):
@@ -39,7 +47,7 @@ async def register_user(
         name=user_data.name,
         email=user_data.email,
         password_hash=hashed_password,
-        role="PROSPECTO"
+        role=UserRole.PROSPECTO
     )
     
     db.add(new_user)
@@ -58,17 +66,21 @@ async def login_user(
     user_data: UserLogin,
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.email == user_data.email).first()
-    
-    if not user or not verify_password(user_data.password, user.password_hash):
+    # Select liviano de solo las columnas necesarias: evita materializar la
+    # instancia ORM completa en un path de solo lectura
+    user = db.execute(_LOGIN_STMT, {"email": user_data.email}).first()
+
+    if not user or not await verify_password_async(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales incorrectas",
             headers={"WWW-Authenticate": "Bearer"}
         )
-    
-    access_token = create_access_token(data={"sub": user.email})
-    
+
+    # sub lleva el id del usuario: es lo que los statements precompilados
+    # de core.auth usan para resolverlo en cada request
+    access_token = create_access_token(data={"sub": str(user.id)})
+
     return {
         "access_token": access_token,
         "token_type": "bearer",
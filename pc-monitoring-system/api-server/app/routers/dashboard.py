@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, case
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 from pydantic import BaseModel
 
-from ..models.database import get_db, User, Manager, Machine, Scan, Threat, ThreatLevel
-from ..core.auth import get_current_user_dependency
+from ..models.database import get_db, User, Machine, Scan, Threat, ThreatLevel
+from ..core.auth import get_manager_id, require_manager
+from ..core.token_store import TokenStore
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
+# Cache corto del resumen por gerente: el dashboard se refresca mucho más
+# seguido de lo que cambian los datos, y cada cómputo pega varias queries
+_summary_cache = TokenStore("dash:summary", ttl=30)
+
 class DashboardSummary(BaseModel):
     total_machines: int
     machines_ok: int
@@ -20,74 +25,95 @@ class DashboardSummary(BaseModel):
     machine_status_breakdown: Dict[str, int]
 
 @router.get("/summary", response_model=DashboardSummary)
-async def get_dashboard_summary(
-    current_user: User = Depends(get_current_user_dependency),
+def get_dashboard_summary(
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden acceder al dashboard"
-        )
-    
     try:
-        manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-        if not manager:
+        manager_id = get_manager_id(db, current_user.id)
+        if not manager_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de gerente no encontrado"
             )
         
-        total_machines = db.query(Machine).filter(Machine.manager_id == manager.id).count()
-        
-        machines_with_recent_scans = db.query(Machine).join(Scan).filter(
-            Machine.manager_id == manager.id,
-            Scan.scan_time >= datetime.now() - timedelta(hours=24)
-        ).distinct().count()
-        
-        machines_critical = db.query(Machine).join(Threat).filter(
-            Machine.manager_id == manager.id,
-            Threat.level == ThreatLevel.CRITICO,
+        cached = _summary_cache.get(str(manager_id))
+        if cached is not None:
+            return DashboardSummary(**cached)
+
+        now = datetime.now()
+
+        # Conteos de máquinas con agregados condicionales. Scans y threats
+        # se agregan por separado: un join simultáneo contra ambas tablas
+        # produce un producto cartesiano scans×threats por máquina antes
+        # de que el count(distinct) lo colapse
+        machine_totals = db.query(
+            func.count(func.distinct(Machine.id)).label("total"),
+            func.count(func.distinct(case(
+                (Scan.scan_timestamp >= now - timedelta(hours=24), Machine.id)
+            ))).label("recent")
+        ).select_from(Machine).outerjoin(
+            Scan, Scan.machine_id == Machine.id
+        ).filter(Machine.manager_id == manager_id).one()
+
+        machines_critical = db.query(
+            func.count(func.distinct(Machine.id))
+        ).select_from(Machine).join(
+            Threat, Threat.machine_id == Machine.id
+        ).filter(
+            Machine.manager_id == manager_id,
+            Threat.level == ThreatLevel.CRITICAL,
             Threat.resolved == False
-        ).distinct().count()
-        
+        ).scalar() or 0
+
+        total_machines = machine_totals.total or 0
+        machines_with_recent_scans = machine_totals.recent or 0
         machines_ok = total_machines - machines_critical
-        
-        recent_threats = db.query(Threat).join(Machine).filter(
-            Machine.manager_id == manager.id,
-            Threat.detected_at >= datetime.now() - timedelta(days=7)
-        ).count()
-        
-        last_scan = db.query(Scan).join(Machine).filter(
-            Machine.manager_id == manager.id
-        ).order_by(desc(Scan.scan_time)).first()
-        
-        last_scan_time = last_scan.scan_time.isoformat() if last_scan else None
-        
-        threat_breakdown = {}
-        for level in ThreatLevel:
-            count = db.query(Threat).join(Machine).filter(
-                Machine.manager_id == manager.id,
-                Threat.level == level,
-                Threat.resolved == False
-            ).count()
-            threat_breakdown[level.value] = count
-        
+
+        # Breakdown por nivel y amenazas recientes en un solo GROUP BY
+        # (antes: una query por cada ThreatLevel más una para el total)
+        threat_rows = db.query(
+            Threat.level,
+            func.sum(case((Threat.resolved == False, 1), else_=0)).label("unresolved"),
+            func.sum(case((Threat.detected_at >= now - timedelta(days=7), 1), else_=0)).label("recent")
+        ).join(
+            Machine, Threat.machine_id == Machine.id
+        ).filter(
+            Machine.manager_id == manager_id
+        ).group_by(Threat.level).all()
+
+        threat_breakdown = {level.value: 0 for level in ThreatLevel}
+        recent_threats = 0
+        for level, unresolved, recent in threat_rows:
+            threat_breakdown[level.value] = int(unresolved or 0)
+            recent_threats += int(recent or 0)
+
+        last_scan = db.query(Scan).join(
+            Machine, Scan.machine_id == Machine.id
+        ).filter(
+            Machine.manager_id == manager_id
+        ).order_by(desc(Scan.scan_timestamp)).first()
+
+        last_scan_time = last_scan.scan_timestamp.isoformat() if last_scan else None
+
         machine_status_breakdown = {
             "ok": machines_ok,
             "critical": machines_critical,
             "offline": max(0, total_machines - machines_with_recent_scans)
         }
         
-        return DashboardSummary(
-            total_machines=total_machines,
-            machines_ok=machines_ok,
-            machines_critical=machines_critical,
-            recent_threats=recent_threats,
-            last_scan_time=last_scan_time,
-            threat_breakdown=threat_breakdown,
-            machine_status_breakdown=machine_status_breakdown
-        )
+        summary_data = {
+            "total_machines": total_machines,
+            "machines_ok": machines_ok,
+            "machines_critical": machines_critical,
+            "recent_threats": recent_threats,
+            "last_scan_time": last_scan_time,
+            "threat_breakdown": threat_breakdown,
+            "machine_status_breakdown": machine_status_breakdown
+        }
+        _summary_cache.set(str(manager_id), summary_data)
+
+        return DashboardSummary(**summary_data)
         
     except HTTPException:
         raise
@@ -1,41 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from datetime import datetime
 import secrets
+import time
 
 from ..models.database import get_db, User, Manager, UserRole
 from ..core.auth import get_password_hash
+from ..core.token_store import TokenStore
 
 router = APIRouter(prefix="/invitations", tags=["invitations"])
 
+INVITATION_TTL_DAYS = 7
+
 class AcceptInvitation(BaseModel):
     token: str
     password: str
 
-invitation_tokens = {}
+# Compartido entre workers vía Redis cuando settings.redis_url está configurado
+invitation_tokens = TokenStore("invitation", ttl=INVITATION_TTL_DAYS * 86400)
 
 @router.post("/accept")
-async def accept_invitation(
+def accept_invitation(
     invitation_data: AcceptInvitation,
     db: Session = Depends(get_db)
 ):
     try:
-        if invitation_data.token not in invitation_tokens:
+        # pop atómico (GETDEL en Redis): dos requests concurrentes con la misma
+        # invitación no pueden crear dos cuentas
+        token_data = invitation_tokens.pop(invitation_data.token)
+
+        if token_data is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Token de invitación inválido o expirado"
             )
-        
-        token_data = invitation_tokens[invitation_data.token]
-        
-        if (datetime.utcnow() - token_data["created_at"]).days > 7:
-            del invitation_tokens[invitation_data.token]
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Token de invitación expirado"
-            )
-        
+
         manager = db.query(Manager).filter(Manager.id == token_data["manager_id"]).first()
         if not manager:
             raise HTTPException(
@@ -62,8 +61,6 @@ async def accept_invitation(
         db.commit()
         db.refresh(new_user)
         
-        del invitation_tokens[invitation_data.token]
-        
         return {
             "status": "success",
             "message": "Cuenta de agente creada exitosamente",
@@ -81,32 +78,25 @@ async def accept_invitation(
 
 def create_invitation_token(manager_id: str, email: str) -> str:
     token = secrets.token_urlsafe(32)
-    invitation_tokens[token] = {
+    invitation_tokens.set(token, {
         "manager_id": manager_id,
         "email": email,
-        "created_at": datetime.utcnow()
-    }
+        "expires_at": time.time() + INVITATION_TTL_DAYS * 86400
+    })
     return token
 
 @router.get("/validate/{token}")
-async def validate_invitation_token(token: str):
-    if token not in invitation_tokens:
+def validate_invitation_token(token: str):
+    token_data = invitation_tokens.get(token)
+
+    if token_data is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Token de invitación inválido"
         )
-    
-    token_data = invitation_tokens[token]
-    
-    if (datetime.utcnow() - token_data["created_at"]).days > 7:
-        del invitation_tokens[token]
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Token de invitación expirado"
-        )
-    
+
     return {
         "status": "valid",
         "email": token_data["email"],
-        "expires_in_days": 7 - (datetime.utcnow() - token_data["created_at"]).days
+        "expires_in_days": int((token_data["expires_at"] - time.time()) // 86400)
     }
\ No newline at end of file
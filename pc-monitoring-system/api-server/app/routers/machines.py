@@ -1,80 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from sqlalchemy import desc, func, update, tuple_
+from typing import Optional
 from pydantic import BaseModel
 from datetime import datetime
 
-from ..models.database import get_db, User, Manager, Machine, Scan
-from ..core.auth import get_current_user_dependency
+from ..models.database import get_db, User, Machine, Scan
+from ..core.auth import get_manager_id, require_manager
+from ..core.http_cache import CACHE_CONTROL, make_etag
 
 router = APIRouter(prefix="/machines", tags=["machines"])
 
-class MachineResponse(BaseModel):
-    id: int
-    fingerprint: str
-    name: str
-    friendly_name: Optional[str]
-    last_seen: Optional[str]
-    status: Optional[str]
-    scan_count: int
-    
-    class Config:
-        from_attributes = True
-
 class MachineUpdateRequest(BaseModel):
     friendly_name: str
 
-class ScanResponse(BaseModel):
-    id: int
-    timestamp: str
-    status: str
-    scan_data: dict
-    threats_detected: int
-    
-    class Config:
-        from_attributes = True
-
-@router.get("", response_model=List[MachineResponse])
-async def get_machines(
-    current_user: User = Depends(get_current_user_dependency),
+@router.get("")
+def get_machines(
+    request: Request,
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden acceder a las máquinas"
-        )
-    
     try:
-        manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-        if not manager:
+        manager_id = get_manager_id(db, current_user.id)
+        if not manager_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de gerente no encontrado"
             )
         
-        machines = db.query(Machine).filter(Machine.manager_id == manager.id).all()
-        
-        result = []
-        for machine in machines:
-            last_scan = db.query(Scan).filter(
-                Scan.machine_id == machine.id
-            ).order_by(desc(Scan.timestamp)).first()
-            
-            scan_count = db.query(Scan).filter(Scan.machine_id == machine.id).count()
-            
-            result.append(MachineResponse(
-                id=machine.id,
-                fingerprint=machine.fingerprint,
-                name=machine.name,
-                friendly_name=machine.friendly_name,
-                last_seen=last_scan.timestamp.isoformat() if last_scan else None,
-                status=last_scan.status if last_scan else "UNKNOWN",
-                scan_count=scan_count
-            ))
-        
-        return result
+        # GET condicional (RFC 9111): el ETag resume el estado de la flota,
+        # así los sondeos del dashboard evitan re-serializar la lista entera
+        fleet_state = db.query(
+            func.count(Machine.id),
+            func.max(Machine.last_seen),
+            func.max(Machine.updated_at)
+        ).filter(Machine.manager_id == manager_id).one()
+        etag = make_etag(manager_id, *fleet_state)
+        if request.headers.get("if-none-match") == etag:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+            )
+        # Los agregados denormalizados (scan_count/last_seen/last_status) se
+        # mantienen al recibir cada escaneo, así el listado no toca scans
+        machines = db.query(Machine).filter(Machine.manager_id == manager_id).all()
+
+        # Sin round-trip por Pydantic a la salida: los datos vienen de la BD
+        # y orjson serializa los dicts directamente en C
+        return ORJSONResponse([
+            {
+                "id": machine.id,
+                "fingerprint": machine.hardware_id,
+                "name": machine.name,
+                "friendly_name": machine.friendly_name,
+                "last_seen": machine.last_seen.isoformat() if machine.last_seen else None,
+                "status": machine.last_status if machine.last_status else "UNKNOWN",
+                "scan_count": machine.scan_count or 0
+            }
+            for machine in machines
+        ], headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
         
     except HTTPException:
         raise
@@ -84,23 +69,18 @@ async def get_machines(
             detail=f"Error obteniendo máquinas: {str(e)}"
         )
 
-@router.get("/{machine_id}/scans", response_model=List[ScanResponse])
-async def get_machine_scans(
-    machine_id: int,
+@router.get("/{machine_id}/scans")
+def get_machine_scans(
+    machine_id: str,
     limit: int = Query(50),
-    offset: int = Query(0),
-    current_user: User = Depends(get_current_user_dependency),
+    before_ts: Optional[datetime] = Query(None),
+    before_id: Optional[str] = Query(None),
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden acceder a los escaneos"
-        )
-    
     try:
-        manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-        if not manager:
+        manager_id = get_manager_id(db, current_user.id)
+        if not manager_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de gerente no encontrado"
@@ -108,7 +88,7 @@ async def get_machine_scans(
         
         machine = db.query(Machine).filter(
             Machine.id == machine_id,
-            Machine.manager_id == manager.id
+            Machine.manager_id == manager_id
         ).first()
         
         if not machine:
@@ -117,23 +97,37 @@ async def get_machine_scans(
                 detail="Máquina no encontrada"
             )
         
-        scans = db.query(Scan).filter(
-            Scan.machine_id == machine_id
-        ).order_by(desc(Scan.timestamp)).offset(offset).limit(limit).all()
-        
-        result = []
-        for scan in scans:
-            threats_count = len(scan.threats) if hasattr(scan, 'threats') else 0
-            
-            result.append(ScanResponse(
-                id=scan.id,
-                timestamp=scan.timestamp.isoformat(),
-                status=scan.status,
-                scan_data=scan.scan_data,
-                threats_detected=threats_count
-            ))
-        
-        return result
+        query = db.query(Scan).filter(Scan.machine_id == machine_id)
+
+        # Paginación keyset sobre (scan_timestamp, id): páginas profundas
+        # cuestan lo mismo que la primera, a diferencia de OFFSET
+        if before_ts is not None:
+            if before_id is not None:
+                query = query.filter(
+                    tuple_(Scan.scan_timestamp, Scan.id) < (before_ts, before_id)
+                )
+            else:
+                query = query.filter(Scan.scan_timestamp < before_ts)
+
+        scans = query.order_by(
+            desc(Scan.scan_timestamp), desc(Scan.id)
+        ).limit(limit).all()
+
+        headers = {}
+        if len(scans) == limit:
+            headers["X-Next-Before-Ts"] = scans[-1].scan_timestamp.isoformat()
+            headers["X-Next-Before-Id"] = str(scans[-1].id)
+
+        return ORJSONResponse([
+            {
+                "id": scan.id,
+                "timestamp": scan.scan_timestamp.isoformat(),
+                "status": scan.status,
+                "scan_data": scan.scan_data,
+                "threats_detected": scan.threats_detected or 0
+            }
+            for scan in scans
+        ], headers=headers)
         
     except HTTPException:
         raise
@@ -143,56 +137,51 @@ async def get_machine_scans(
             detail=f"Error obteniendo escaneos: {str(e)}"
         )
 
-@router.put("/{machine_id}", response_model=MachineResponse)
-async def update_machine(
-    machine_id: int,
+@router.put("/{machine_id}")
+def update_machine(
+    machine_id: str,
     machine_update: MachineUpdateRequest,
-    current_user: User = Depends(get_current_user_dependency),
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden actualizar máquinas"
-        )
-    
     try:
-        manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-        if not manager:
+        manager_id = get_manager_id(db, current_user.id)
+        if not manager_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de gerente no encontrado"
             )
         
-        machine = db.query(Machine).filter(
-            Machine.id == machine_id,
-            Machine.manager_id == manager.id
-        ).first()
-        
+        # UPDATE ... RETURNING valida pertenencia, actualiza y devuelve la
+        # fila en un solo round-trip (antes SELECT + UPDATE separados)
+        machine = db.execute(
+            update(Machine)
+            .where(Machine.id == machine_id, Machine.manager_id == manager_id)
+            .values(friendly_name=machine_update.friendly_name)
+            .returning(Machine),
+            execution_options={"synchronize_session": False}
+        ).scalar_one_or_none()
+
         if not machine:
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Máquina no encontrada"
             )
-        
-        machine.friendly_name = machine_update.friendly_name
+
         db.commit()
-        
-        last_scan = db.query(Scan).filter(
-            Scan.machine_id == machine.id
-        ).order_by(desc(Scan.timestamp)).first()
-        
-        scan_count = db.query(Scan).filter(Scan.machine_id == machine.id).count()
-        
-        return MachineResponse(
-            id=machine.id,
-            fingerprint=machine.fingerprint,
-            name=machine.name,
-            friendly_name=machine.friendly_name,
-            last_seen=last_scan.timestamp.isoformat() if last_scan else None,
-            status=last_scan.status if last_scan else "UNKNOWN",
-            scan_count=scan_count
-        )
+
+        # Mismo formato de dict que el listado: orjson serializa el GUID
+        # directamente, sin pasar por un modelo de respuesta
+        return ORJSONResponse({
+            "id": machine.id,
+            "fingerprint": machine.hardware_id,
+            "name": machine.name,
+            "friendly_name": machine.friendly_name,
+            "last_seen": machine.last_seen.isoformat() if machine.last_seen else None,
+            "status": machine.last_status if machine.last_status else "UNKNOWN",
+            "scan_count": machine.scan_count or 0
+        })
         
     except HTTPException:
         raise
@@ -3,13 +3,14 @@ from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from urllib.parse import urlencode
 import secrets
-import requests
+import httpx
 from typing import Optional
 from datetime import datetime
 
 from ..models.database import get_db, User, Manager
-from ..core.auth import get_current_user_dependency
+from ..core.auth import get_manager_id, require_manager
 from ..core.config import settings
+from ..core.token_store import TokenStore
 
 router = APIRouter(prefix="/powerbi", tags=["powerbi"])
 
@@ -18,32 +19,32 @@ POWERBI_CLIENT_SECRET = getattr(settings, 'POWERBI_CLIENT_SECRET', 'your-powerbi
 POWERBI_REDIRECT_URI = getattr(settings, 'POWERBI_REDIRECT_URI', 'http://localhost:8000/api/v1/powerbi/callback')
 POWERBI_SCOPE = "https://analysis.windows.net/powerbi/api/.default"
 
-oauth_states = {}
+# Estados OAuth con TTL: expiran solos si el callback nunca llega y, con
+# Redis configurado, sobreviven el reparto entre workers de Uvicorn
+oauth_states = TokenStore("pbistate", ttl=600)
+
+# Cliente compartido: reutiliza conexiones TLS hacia login.microsoftonline.com
+# en vez de pagar el handshake en cada callback. Se cierra en shutdown_http_client.
+http_client = httpx.AsyncClient(timeout=10)
+
+async def shutdown_http_client():
+    await http_client.aclose()
 
 @router.get("/connect")
-async def connect_powerbi(
-    current_user: User = Depends(get_current_user_dependency),
+def connect_powerbi(
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden conectar con Power BI"
-        )
-    
     try:
-        manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-        if not manager:
+        manager_id = get_manager_id(db, current_user.id)
+        if not manager_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de gerente no encontrado"
             )
         
         state = secrets.token_urlsafe(32)
-        oauth_states[state] = {
-            "manager_id": str(manager.id),
-            "created_at": datetime.utcnow()
-        }
+        oauth_states.set(state, {"manager_id": str(manager_id)})
         
         auth_params = {
             "client_id": POWERBI_CLIENT_ID,
@@ -90,14 +91,16 @@ async def powerbi_callback(
             detail="Código de autorización o estado faltante"
         )
     
-    if state not in oauth_states:
+    # pop consume el estado atómicamente: un segundo callback con el mismo
+    # state falla en lugar de repetir el intercambio de tokens
+    state_data = oauth_states.pop(state)
+    if state_data is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Estado OAuth inválido"
         )
-    
+
     try:
-        state_data = oauth_states[state]
         manager_id = state_data["manager_id"]
         
         token_data = {
@@ -109,11 +112,12 @@ async def powerbi_callback(
             "scope": POWERBI_SCOPE
         }
         
-        token_response = requests.post(
+        # await libera el event loop durante el round-trip a Microsoft
+        token_response = await http_client.post(
             "https://login.microsoftonline.com/common/oauth2/v2.0/token",
             data=token_data
         )
-        
+
         if token_response.status_code != 200:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -128,9 +132,7 @@ async def powerbi_callback(
             manager.powerbi_refresh_token = tokens.get("refresh_token")
             manager.powerbi_connected_at = datetime.utcnow()
             db.commit()
-        
-        del oauth_states[state]
-        
+
         return {
             "status": "success",
             "message": "Conexión con Power BI establecida exitosamente"
@@ -145,16 +147,10 @@ async def powerbi_callback(
         )
 
 @router.get("/status")
-async def get_powerbi_status(
-    current_user: User = Depends(get_current_user_dependency),
+def get_powerbi_status(
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden consultar el estado de Power BI"
-        )
-    
     manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
     if not manager:
         raise HTTPException(
@@ -171,16 +167,10 @@ async def get_powerbi_status(
     }
 
 @router.delete("/disconnect")
-async def disconnect_powerbi(
-    current_user: User = Depends(get_current_user_dependency),
+def disconnect_powerbi(
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden desconectar Power BI"
-        )
-    
     manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
     if not manager:
         raise HTTPException(
@@ -1,23 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-from ..models.database import get_db, Machine, Scan, Manager, Threat
+from ..models.database import get_db, SessionLocal, Machine, Scan, Manager, Threat, dialect_insert
 from ..services import ThreatAnalyzer
 
 router = APIRouter(tags=["scans"])
 
+# Instancia única: las reglas del analizador son de solo lectura, así que
+# construirlo por request solo generaba asignaciones y presión de GC
+threat_analyzer = ThreatAnalyzer()
+
 class ScanData(BaseModel):
     manager_id: str
     machine_name: str
     machine_id: Optional[str] = None
     scan_data: Dict[str, Any]
 
+def run_threat_analysis(scan_id, machine_id, scan_payload: Dict[str, Any]):
+    """Tarea de fondo: analiza el escaneo y persiste las amenazas detectadas.
+
+    Corre después de responder al agente, así el POST /scans solo paga el
+    costo de los INSERT. Abre su propia sesión porque la del request ya se
+    devolvió al pool.
+    """
+    db = SessionLocal()
+    try:
+        threats = threat_analyzer.analyze_scan_data(machine_id, scan_payload)
+
+        # Un solo INSERT multi-VALUES en lugar de un INSERT por amenaza
+        if threats:
+            db.bulk_insert_mappings(Threat, [
+                {
+                    "machine_id": t.machine_id,
+                    "threat_type": t.threat_type,
+                    "description": t.description,
+                    "evidence": t.evidence,
+                    "detected_at": t.detected_at,
+                }
+                for t in threats
+            ])
+
+        db.query(Scan).filter(Scan.id == scan_id).update(
+            {Scan.threats_detected: len(threats)}, synchronize_session=False
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 @router.post("/scans")
-async def receive_scan_data(
+def receive_scan_data(
     scan_data: ScanData,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     try:
@@ -28,58 +67,57 @@ async def receive_scan_data(
                 detail="Manager no encontrado"
             )
         
-        # Buscar o crear la máquina
-        machine = db.query(Machine).filter(
-            Machine.manager_id == scan_data.manager_id,
-            Machine.machine_name == scan_data.machine_name
-        ).first()
-        
-        if not machine:
-            machine = Machine(
+        now = datetime.utcnow()
+
+        # UPSERT atómico sobre (manager_id, name): un solo round-trip y sin
+        # ventana de carrera cuando dos escaneos estrenan la misma máquina
+        machine_id = db.execute(
+            dialect_insert(Machine).values(
                 manager_id=scan_data.manager_id,
-                machine_name=scan_data.machine_name,
-                machine_id=scan_data.machine_id or scan_data.machine_name,
+                name=scan_data.machine_name,
+                hardware_id=scan_data.machine_id or scan_data.machine_name,
                 status="ACTIVE"
-            )
-            db.add(machine)
-            db.commit()
-            db.refresh(machine)
-        
-        # Crear registro de escaneo
+            ).on_conflict_do_update(
+                index_elements=[Machine.manager_id, Machine.name],
+                set_={"updated_at": now}
+            ).returning(Machine.id)
+        ).scalar_one()
+
         scan = Scan(
-            machine_id=machine.id,
+            machine_id=machine_id,
             scan_data=scan_data.scan_data,
-            scan_date=datetime.utcnow()
+            scan_timestamp=now
         )
         db.add(scan)
+        # flush (no commit) basta para asignar scan.id; todo el ingreso se
+        # confirma en un único commit, un solo fsync por escaneo
+        db.flush()
+
+        # Mantener los agregados denormalizados de la máquina: los listados
+        # leen scan_count/last_seen/last_status sin tocar la tabla scans
+        db.query(Machine).filter(Machine.id == machine_id).update({
+            Machine.scan_count: Machine.scan_count + 1,
+            Machine.last_seen: scan.scan_timestamp,
+            Machine.last_status: scan.status
+        }, synchronize_session=False)
+
         db.commit()
-        db.refresh(scan)
-        
-        # Analizar amenazas
-        analyzer = ThreatAnalyzer()
-        threats = analyzer.analyze_scan_data(scan_data.scan_data)
-        
-        # Guardar amenazas detectadas
-        for threat_data in threats:
-            threat = Threat(
-                machine_id=machine.id,
-                threat_type=threat_data.threat_type,
-                description=threat_data.description,
-                status="ACTIVE",
-                evidence=threat_data.evidence,
-                detected_at=datetime.utcnow()
-            )
-            db.add(threat)
-        
-        db.commit()
-        
+
+        # El análisis corre tras enviar la respuesta; el agente no espera
+        background_tasks.add_task(
+            run_threat_analysis, scan.id, machine_id, scan_data.scan_data
+        )
+
         return {
             "status": "success",
-            "message": "Datos de escaneo procesados correctamente",
+            "message": "Datos de escaneo recibidos; análisis en curso",
             "scan_id": scan.id,
-            "threats_detected": len(threats)
+            "analysis_status": "QUEUED"
         }
         
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -1,61 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import desc, func, tuple_
+from typing import Optional
 from datetime import datetime, timedelta
 
-from ..models.database import get_db, User, Manager, Machine, Threat, ThreatLevel
-from ..core.auth import get_current_user_dependency
+from ..models.database import get_db, User, Machine, Threat, ThreatLevel
+from ..core.auth import get_manager_id, require_manager
+from ..core.http_cache import CACHE_CONTROL, make_etag
 
 router = APIRouter(prefix="/threats", tags=["threats"])
 
-class ThreatResponse(BaseModel):
-    id: int
-    machine_id: int
-    machine_name: str
-    machine_friendly_name: Optional[str]
-    threat_type: str
-    level: ThreatLevel
-    description: str
-    details: dict
-    detected_at: str
-    resolved: bool
-    
-    class Config:
-        from_attributes = True
-
-@router.get("", response_model=List[ThreatResponse])
-async def get_threats(
+@router.get("")
+def get_threats(
+    request: Request,
     threat_type: Optional[str] = Query(None),
     level: Optional[ThreatLevel] = Query(None),
     days: int = Query(30),
     resolved: Optional[bool] = Query(None),
     limit: int = Query(100),
-    offset: int = Query(0),
-    current_user: User = Depends(get_current_user_dependency),
+    before_ts: Optional[datetime] = Query(None),
+    before_id: Optional[str] = Query(None),
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden acceder a las amenazas"
-        )
-    
     try:
-        # Obtener el manager
-        manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-        if not manager:
+        manager_id = get_manager_id(db, current_user.id)
+        if not manager_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de gerente no encontrado"
             )
         
-        # Construir query base
-        query = db.query(Threat, Machine).join(
+        # GET condicional: el estado global de amenazas del gerente más los
+        # filtros de la URL determinan el ETag; 304 evita hidratar y
+        # serializar las filas cuando nada cambió desde el último sondeo
+        threat_state = db.query(
+            func.count(Threat.id),
+            func.max(Threat.updated_at)
+        ).join(
             Machine, Threat.machine_id == Machine.id
+        ).filter(Machine.manager_id == manager_id).one()
+        etag = make_etag(manager_id, request.url.query, *threat_state)
+        if request.headers.get("if-none-match") == etag:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+            )
+        # Construir query base: contains_eager reutiliza el join del filtro
+        # para poblar Threat.machine sin una segunda pasada ni tuple boxing
+        query = db.query(Threat).join(Threat.machine).options(
+            contains_eager(Threat.machine)
         ).filter(
-            Machine.manager_id == manager.id
+            Machine.manager_id == manager_id
         )
         
         # Aplicar filtros
@@ -71,29 +69,45 @@ async def get_threats(
         
         if resolved is not None:
             query = query.filter(Threat.resolved == resolved)
-        
-        # Ordenar por fecha de detección (más recientes primero)
-        query = query.order_by(desc(Threat.detected_at))
-        
-        # Aplicar paginación
-        threats_with_machines = query.offset(offset).limit(limit).all()
-        
-        result = []
-        for threat, machine in threats_with_machines:
-            result.append(ThreatResponse(
-                id=threat.id,
-                machine_id=machine.id,
-                machine_name=machine.name,
-                machine_friendly_name=machine.friendly_name,
-                threat_type=threat.threat_type,
-                level=threat.level,
-                description=threat.description,
-                details=threat.details,
-                detected_at=threat.detected_at.isoformat(),
-                resolved=threat.resolved
-            ))
-        
-        return result
+
+        # Paginación keyset sobre (detected_at, id): el índice compuesto la
+        # resuelve en O(log n) por página sin descartar filas como OFFSET
+        if before_ts is not None:
+            if before_id is not None:
+                query = query.filter(
+                    tuple_(Threat.detected_at, Threat.id) < (before_ts, before_id)
+                )
+            else:
+                query = query.filter(Threat.detected_at < before_ts)
+
+        # Ordenar por fecha de detección (más recientes primero); id como
+        # desempate estable para el cursor
+        query = query.order_by(desc(Threat.detected_at), desc(Threat.id))
+
+        threats = query.limit(limit).all()
+
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if len(threats) == limit:
+            headers["X-Next-Before-Ts"] = threats[-1].detected_at.isoformat()
+            headers["X-Next-Before-Id"] = str(threats[-1].id)
+
+        # Sin round-trip por Pydantic a la salida: los datos vienen de la BD
+        # y orjson serializa los dicts (incluido details JSONB) directo en C
+        return ORJSONResponse([
+            {
+                "id": threat.id,
+                "machine_id": threat.machine.id,
+                "machine_name": threat.machine.name,
+                "machine_friendly_name": threat.machine.friendly_name,
+                "threat_type": threat.threat_type,
+                "level": threat.level.value,
+                "description": threat.description,
+                "details": threat.details,
+                "detected_at": threat.detected_at.isoformat(),
+                "resolved": threat.resolved
+            }
+            for threat in threats
+        ], headers=headers)
         
     except HTTPException:
         raise
@@ -103,22 +117,67 @@ async def get_threats(
             detail=f"Error obteniendo amenazas: {str(e)}"
         )
 
-@router.put("/{threat_id}/resolve")
-async def resolve_threat(
-    threat_id: int,
-    current_user: User = Depends(get_current_user_dependency),
+@router.get("/export")
+def export_threats(
+    days: int = Query(0),
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
+    """Exporta todas las amenazas del gerente como JSON transmitido.
+
+    Pensado para alimentar Power BI u otros consumidores masivos: yield_per
+    trae las filas en lotes de 500 y el generador las serializa sobre la
+    marcha, así la memoria queda acotada al lote sin importar el total.
+    """
+    manager_id = get_manager_id(db, current_user.id)
+    if not manager_id:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden resolver amenazas"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Perfil de gerente no encontrado"
+        )
+
+    query = db.query(Threat).join(Threat.machine).options(
+        contains_eager(Threat.machine)
+    ).filter(Machine.manager_id == manager_id)
+
+    if days > 0:
+        query = query.filter(
+            Threat.detected_at >= datetime.now() - timedelta(days=days)
         )
-    
+
+    query = query.order_by(desc(Threat.detected_at), desc(Threat.id))
+
+    def row_iter():
+        yield b"["
+        first = True
+        for threat in query.yield_per(500):
+            if not first:
+                yield b","
+            first = False
+            yield orjson.dumps({
+                "id": threat.id,
+                "machine_id": threat.machine.id,
+                "machine_name": threat.machine.name,
+                "threat_type": threat.threat_type,
+                "level": threat.level.value,
+                "description": threat.description,
+                "details": threat.details,
+                "detected_at": threat.detected_at.isoformat(),
+                "resolved": threat.resolved
+            })
+        yield b"]"
+
+    return StreamingResponse(row_iter(), media_type="application/json")
+
+@router.put("/{threat_id}/resolve")
+def resolve_threat(
+    threat_id: str,
+    current_user: User = Depends(require_manager),
+    db: Session = Depends(get_db)
+):
     try:
-        # Obtener el manager
-        manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-        if not manager:
+        manager_id = get_manager_id(db, current_user.id)
+        if not manager_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de gerente no encontrado"
@@ -129,7 +188,7 @@ async def resolve_threat(
             Machine, Threat.machine_id == Machine.id
         ).filter(
             Threat.id == threat_id,
-            Machine.manager_id == manager.id
+            Machine.manager_id == manager_id
         ).first()
         
         if not threat:
@@ -165,76 +224,46 @@ async def resolve_threat(
         )
 
 @router.get("/stats")
-async def get_threat_stats(
+def get_threat_stats(
     days: int = Query(30),
-    current_user: User = Depends(get_current_user_dependency),
+    current_user: User = Depends(require_manager),
     db: Session = Depends(get_db)
 ):
-    if current_user.role.value != "GERENTE":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Solo los gerentes pueden acceder a las estadísticas"
-        )
-    
     try:
-        # Obtener el manager
-        manager = db.query(Manager).filter(Manager.user_id == current_user.id).first()
-        if not manager:
+        manager_id = get_manager_id(db, current_user.id)
+        if not manager_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de gerente no encontrado"
             )
         
         cutoff_date = datetime.now() - timedelta(days=days)
-        
-        # Estadísticas por nivel
-        stats_by_level = {}
-        for level in ThreatLevel:
-            count = db.query(Threat).join(
-                Machine, Threat.machine_id == Machine.id
-            ).filter(
-                Machine.manager_id == manager.id,
-                Threat.level == level,
-                Threat.detected_at >= cutoff_date
-            ).count()
-            stats_by_level[level.value] = count
-        
-        # Estadísticas por tipo
-        threat_types = db.query(Threat.threat_type).join(
+
+        # Todas las estadísticas en un solo GROUP BY; antes eran
+        # len(ThreatLevel) + len(tipos) + 2 queries COUNT sobre el mismo join
+        rows = db.query(
+            Threat.level,
+            Threat.threat_type,
+            Threat.resolved,
+            func.count()
+        ).join(
             Machine, Threat.machine_id == Machine.id
         ).filter(
-            Machine.manager_id == manager.id,
+            Machine.manager_id == manager_id,
             Threat.detected_at >= cutoff_date
-        ).distinct().all()
-        
+        ).group_by(Threat.level, Threat.threat_type, Threat.resolved).all()
+
+        stats_by_level = {level.value: 0 for level in ThreatLevel}
         stats_by_type = {}
-        for (threat_type,) in threat_types:
-            count = db.query(Threat).join(
-                Machine, Threat.machine_id == Machine.id
-            ).filter(
-                Machine.manager_id == manager.id,
-                Threat.threat_type == threat_type,
-                Threat.detected_at >= cutoff_date
-            ).count()
-            stats_by_type[threat_type] = count
-        
-        # Total de amenazas
-        total_threats = db.query(Threat).join(
-            Machine, Threat.machine_id == Machine.id
-        ).filter(
-            Machine.manager_id == manager.id,
-            Threat.detected_at >= cutoff_date
-        ).count()
-        
-        # Amenazas resueltas
-        resolved_threats = db.query(Threat).join(
-            Machine, Threat.machine_id == Machine.id
-        ).filter(
-            Machine.manager_id == manager.id,
-            Threat.detected_at >= cutoff_date,
-            Threat.resolved == True
-        ).count()
-        
+        total_threats = 0
+        resolved_threats = 0
+        for level, threat_type, resolved, count in rows:
+            stats_by_level[level.value] += count
+            stats_by_type[threat_type] = stats_by_type.get(threat_type, 0) + count
+            total_threats += count
+            if resolved:
+                resolved_threats += count
+
         return {
             "period_days": days,
             "total_threats": total_threats,
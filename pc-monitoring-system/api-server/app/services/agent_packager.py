@@ -2,164 +2,21 @@
 Servicio para empaquetar el agente scanner
 """
 
+import asyncio
+import concurrent.futures
+import functools
+import io
 import os
+import string
 import zipfile
-import json
-import tempfile
-import shutil
+import orjson
 from pathlib import Path
 from typing import Dict, Any, Optional
 
-class AgentPackager:
-    """Maneja el empaquetado del agente scanner para distribución"""
-    
-    def __init__(self, scanner_path: str = "scanner-agent"):
-        self.scanner_path = Path(scanner_path)
-        self.temp_dir = Path(tempfile.gettempdir()) / "pc_monitor_packages"
-        self.temp_dir.mkdir(exist_ok=True)
-    
-    def create_agent_package(self, manager_id: str, api_base_url: str = "http://localhost:8000/api/v1") -> bytes:
-        """
-        Crea un paquete ZIP con el agente scanner personalizado
-        
-        Args:
-            manager_id: ID del manager para configurar el agente
-            api_base_url: URL base de la API
-            
-        Returns:
-            Bytes del archivo ZIP
-        """
-        package_path = self.temp_dir / f"agent_{manager_id}.zip"
-        
-        with zipfile.ZipFile(package_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Agregar archivos del scanner
-            self._add_scanner_files(zipf)
-            
-            # Crear configuración personalizada
-            config = self._create_config(manager_id, api_base_url)
-            zipf.writestr("config.json", json.dumps(config, indent=2))
-            
-            # Agregar scripts de instalación y ejecución
-            install_script = self._create_install_script()
-            zipf.writestr("install.bat", install_script)
-            
-            run_script = self._create_run_script()
-            zipf.writestr("run_scanner.bat", run_script)
-            
-            service_script = self._create_service_script()
-            zipf.writestr("install_service.bat", service_script)
-            
-            # Agregar requirements
-            requirements = self._get_requirements()
-            zipf.writestr("requirements.txt", requirements)
-            
-            # Agregar README
-            readme = self._create_readme()
-            zipf.writestr("README.txt", readme)
-        
-        # Leer el archivo y retornar bytes
-        with open(package_path, 'rb') as f:
-            package_data = f.read()
-        
-        # Limpiar archivo temporal
-        package_path.unlink()
-        
-        return package_data
-    
-    def create_executable_package(self, manager_id: str, api_base_url: str = "http://localhost:8000/api/v1") -> bytes:
-        """
-        Crea un paquete con ejecutable compilado usando PyInstaller
-        
-        Args:
-            manager_id: ID del manager para configurar el agente
-            api_base_url: URL base de la API
-            
-        Returns:
-            Bytes del archivo ZIP con el ejecutable
-        """
-        package_path = self.temp_dir / f"agent_exe_{manager_id}.zip"
-        build_dir = self.temp_dir / f"build_{manager_id}"
-        
-        try:
-            # Crear directorio temporal para build
-            build_dir.mkdir(exist_ok=True)
-            
-            # Copiar archivos del scanner al directorio de build
-            if self.scanner_path.exists():
-                shutil.copytree(self.scanner_path / "src", build_dir / "src", dirs_exist_ok=True)
-            else:
-                # Crear scanner básico
-                (build_dir / "src").mkdir(exist_ok=True)
-                with open(build_dir / "src" / "main.py", 'w') as f:
-                    f.write(self._create_basic_scanner())
-            
-            # Crear configuración
-            config = self._create_config(manager_id, api_base_url)
-            with open(build_dir / "config.json", 'w') as f:
-                json.dump(config, f, indent=2)
-            
-            # Crear spec file para PyInstaller
-            spec_content = self._create_pyinstaller_spec()
-            with open(build_dir / "scanner.spec", 'w') as f:
-                f.write(spec_content)
-            
-            # Crear el ZIP final
-            with zipfile.ZipFile(package_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Agregar archivos de build
-                for file_path in build_dir.rglob("*"):
-                    if file_path.is_file():
-                        arcname = file_path.relative_to(build_dir)
-                        zipf.write(file_path, arcname)
-                
-                # Agregar scripts de build
-                build_script = self._create_build_script()
-                zipf.writestr("build_executable.bat", build_script)
-                
-                # Agregar README para ejecutable
-                readme_exe = self._create_executable_readme()
-                zipf.writestr("README_EXECUTABLE.txt", readme_exe)
-            
-            # Leer el archivo y retornar bytes
-            with open(package_path, 'rb') as f:
-                package_data = f.read()
-            
-            return package_data
-            
-        finally:
-            # Limpiar directorios temporales
-            if package_path.exists():
-                package_path.unlink()
-            if build_dir.exists():
-                shutil.rmtree(build_dir)
-    
-    def _add_scanner_files(self, zipf: zipfile.ZipFile):
-        """Agrega los archivos del scanner al ZIP"""
-        if self.scanner_path.exists():
-            # Agregar todos los archivos del scanner
-            for file_path in self.scanner_path.rglob("*"):
-                if file_path.is_file() and not file_path.name.startswith('.'):
-                    arcname = file_path.relative_to(self.scanner_path)
-                    zipf.write(file_path, arcname)
-        else:
-            # Si no existe, crear estructura básica
-            zipf.writestr("src/main.py", self._create_basic_scanner())
-            zipf.writestr("src/__init__.py", "")
-    
-    def _create_config(self, manager_id: str, api_base_url: str) -> Dict[str, Any]:
-        """Crea la configuración personalizada para el agente"""
-        return {
-            "manager_id": manager_id,
-            "api_base_url": api_base_url,
-            "scan_interval_minutes": 60,
-            "auto_start": True,
-            "log_level": "INFO",
-            "max_log_files": 10,
-            "log_file_size_mb": 10
-        }
-    
-    def _create_install_script(self) -> str:
-        """Crea el script de instalación para Windows"""
-        return """@echo off
+# Contenido estatico de los paquetes: estos literales no dependen del
+# manager, asi que se definen una sola vez a nivel de modulo en lugar de
+# reconstruirse en cada descarga
+_INSTALL_SCRIPT = """@echo off
 echo ========================================
 echo PC Monitor Scanner Agent - Instalacion
 echo ========================================
@@ -216,19 +73,26 @@ echo   1. Ejecutar como administrador: install_service.bat
 echo.
 pause
 """
-    
-    def _create_run_script(self) -> str:
-        """Crea el script para ejecutar el scanner"""
-        return """@echo off
-echo Iniciando PC Monitor Scanner Agent...
 
-REM Verificar si existe el entorno virtual
+# Guardia compartida: run_scanner.bat e install_service.bat verificaban el
+# entorno virtual con el mismo bloque duplicado; ahora ambos llaman a este
+# script unico, que se emite una sola vez por paquete
+_CHECK_ENV_SCRIPT = """@echo off
+REM Verificacion compartida del entorno virtual
 if not exist "venv\\Scripts\\python.exe" (
     echo Error: Entorno virtual no encontrado
     echo Por favor ejecute install.bat primero
     pause
     exit /b 1
 )
+exit /b 0
+"""
+
+_RUN_SCRIPT = """@echo off
+echo Iniciando PC Monitor Scanner Agent...
+
+REM Verificar el entorno virtual
+call _check_env.bat || exit /b 1
 
 REM Verificar si existe la configuracion
 if not exist "config.json" (
@@ -247,10 +111,13 @@ if errorlevel 1 (
     pause
 )
 """
-    
-    def _create_service_script(self) -> str:
-        """Crea el script para instalar como servicio de Windows"""
-        return """@echo off
+
+# El nombre del servicio se inyecta via string.Template (compilada una vez
+# a nivel de modulo; substitute es C-rapido si se llegara a personalizar
+# por manager) y se resuelve una sola vez al importar para el valor default
+_SERVICE_NAME = "PCMonitorScanner"
+
+_SERVICE_SCRIPT_TEMPLATE = string.Template("""@echo off
 echo ========================================
 echo Instalando PC Monitor Scanner como Servicio
 echo ========================================
@@ -264,15 +131,10 @@ if errorlevel 1 (
     exit /b 1
 )
 
-REM Verificar si existe el entorno virtual
-if not exist "venv\\Scripts\\python.exe" (
-    echo Error: Entorno virtual no encontrado
-    echo Por favor ejecute install.bat primero
-    pause
-    exit /b 1
-)
+REM Verificar el entorno virtual
+call _check_env.bat || exit /b 1
 
-set SERVICE_NAME=PCMonitorScanner
+set SERVICE_NAME=${service_name}
 set CURRENT_DIR=%~dp0
 set PYTHON_EXE=%CURRENT_DIR%venv\\Scripts\\python.exe
 set SCRIPT_PATH=%CURRENT_DIR%src\\main.py
@@ -311,11 +173,11 @@ echo.
 echo O use el Administrador de Servicios de Windows (services.msc)
 echo.
 pause
-"""
-    
-    def _create_build_script(self) -> str:
-        """Crea el script para compilar el ejecutable"""
-        return """@echo off
+""")
+
+_SERVICE_SCRIPT = _SERVICE_SCRIPT_TEMPLATE.substitute(service_name=_SERVICE_NAME)
+
+_BUILD_SCRIPT = """@echo off
 echo ========================================
 echo Compilando PC Monitor Scanner a Ejecutable
 echo ========================================
@@ -358,10 +220,8 @@ echo Para distribuir, copie toda la carpeta dist\\scanner\\
 echo.
 pause
 """
-    
-    def _create_pyinstaller_spec(self) -> str:
-        """Crea el archivo .spec para PyInstaller"""
-        return """# -*- mode: python ; coding: utf-8 -*-
+
+_PYINSTALLER_SPEC = """# -*- mode: python ; coding: utf-8 -*-
 
 block_cipher = None
 
@@ -424,20 +284,16 @@ coll = COLLECT(
     name='scanner',
 )
 """
-    
-    def _get_requirements(self) -> str:
-        """Retorna las dependencias necesarias"""
-        return """psutil==5.9.6
+
+_REQUIREMENTS = """psutil==5.9.6
 requests==2.31.0
 pydantic==2.5.0
 cryptography==41.0.7
 pywin32==306
 wmi==1.5.1
 """
-    
-    def _create_readme(self) -> str:
-        """Crea el archivo README"""
-        return """========================================
+
+_README = """========================================
 PC Monitor Scanner Agent
 ========================================
 
@@ -480,10 +336,8 @@ NOTA DE SEGURIDAD:
 Este software recolecta información del sistema para propósitos de monitoreo
 y seguridad. Todos los datos son enviados de forma segura al servidor central.
 """
-    
-    def _create_executable_readme(self) -> str:
-        """Crea el README para la versión ejecutable"""
-        return """========================================
+
+_EXECUTABLE_README = """========================================
 PC Monitor Scanner Agent - Versión Ejecutable
 ========================================
 
@@ -522,10 +376,8 @@ REQUISITOS PARA EJECUCION:
 - Conexión a Internet
 - NO requiere Python instalado
 """
-    
-    def _create_basic_scanner(self) -> str:
-        """Crea un scanner básico si no existe el código fuente"""
-        return '''#!/usr/bin/env python3
+
+_BASIC_SCANNER = '''#!/usr/bin/env python3
 """
 PC Monitor Scanner Agent - Versión básica
 """
@@ -782,9 +634,8 @@ if __name__ == "__main__":
     else:
         scanner.run_scan()
 '''
-    
-    def _generate_install_script(self) -> str:
-        return """@echo off
+
+_EXE_INSTALL_SCRIPT = """@echo off
 echo ========================================
 echo    PC Monitor Agent - Instalador
 echo ========================================
@@ -831,4 +682,248 @@ echo Para ejecutar manualmente: schtasks /run /tn "PCMonitorAgent"
 echo Para desinstalar: schtasks /delete /tn "PCMonitorAgent" /f
 echo.
 pause
-"""
\ No newline at end of file
+"""
+
+# Los scripts y textos son constantes: se codifican a bytes una sola vez
+# al importar el modulo, asi writestr no paga un encode UTF-8 por entrada
+_CHECK_ENV_SCRIPT_BYTES = _CHECK_ENV_SCRIPT.encode("utf-8")
+_INSTALL_SCRIPT_BYTES = _INSTALL_SCRIPT.encode("utf-8")
+_RUN_SCRIPT_BYTES = _RUN_SCRIPT.encode("utf-8")
+_SERVICE_SCRIPT_BYTES = _SERVICE_SCRIPT.encode("utf-8")
+_BUILD_SCRIPT_BYTES = _BUILD_SCRIPT.encode("utf-8")
+_PYINSTALLER_SPEC_BYTES = _PYINSTALLER_SPEC.encode("utf-8")
+_REQUIREMENTS_BYTES = _REQUIREMENTS.encode("utf-8")
+_README_BYTES = _README.encode("utf-8")
+_EXECUTABLE_README_BYTES = _EXECUTABLE_README.encode("utf-8")
+_BASIC_SCANNER_BYTES = _BASIC_SCANNER.encode("utf-8")
+_EXE_INSTALL_SCRIPT_BYTES = _EXE_INSTALL_SCRIPT.encode("utf-8")
+
+# Plantilla de configuracion del agente: solo manager_id y api_base_url
+# varian por paquete
+_CONFIG_TEMPLATE = {
+    "scan_interval_minutes": 60,
+    "auto_start": True,
+    "log_level": "INFO",
+    "max_log_files": 10,
+    "log_file_size_mb": 10
+}
+
+# Fecha fija para las entradas generadas: evita el time.localtime() que
+# writestr hace por cada nombre y deja el ZIP determinista (mismo manager
+# => mismos bytes, util para ETag/hash aguas arriba)
+_FIXED_DATE = (2024, 1, 1, 0, 0, 0)
+
+def _zip_info(name: str, compress_type: int = zipfile.ZIP_STORED) -> zipfile.ZipInfo:
+    """Crea un ZipInfo con fecha fija para una entrada generada en memoria."""
+    info = zipfile.ZipInfo(name, date_time=_FIXED_DATE)
+    info.compress_type = compress_type
+    return info
+
+def _iter_files(base: str):
+    """Recorre el árbol con os.walk y rinde (ruta completa, arcname).
+
+    os.walk usa scandir por debajo (el d_type del readdir evita el stat por
+    entrada que hace Path.rglob) y el arcname sale de un slice de la ruta en
+    lugar de relative_to. Directorios y archivos ocultos se omiten.
+    """
+    base = os.fspath(base)
+    base_len = len(base) + 1
+    for root, dirs, files in os.walk(base, followlinks=False):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if name.startswith('.'):
+                continue
+            full = os.path.join(root, name)
+            yield full, full[base_len:].replace(os.sep, '/')
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+def _write_tree(zipf: zipfile.ZipFile, base: str, prefix: str = "") -> None:
+    """Lee el árbol en un pool de hilos y escribe las entradas en orden.
+
+    ZipFile no es thread-safe, así que solo las lecturas se paralelizan: el
+    pool solapa la latencia de los open+read chicos con el DEFLATE que corre
+    en el hilo consumidor. El orden de entrada se preserva (map es in-order).
+    """
+    entries = list(_iter_files(base))
+    if not entries:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        contents = pool.map(_read_file, (full for full, _ in entries))
+        for (_, arcname), data in zip(entries, contents):
+            zipf.writestr(_zip_info(prefix + arcname, zipfile.ZIP_DEFLATED), data)
+
+@functools.lru_cache(maxsize=4)
+def _build_static_zip_bytes(scanner_path: str) -> bytes:
+    """Construye (una vez) la parte del ZIP idéntica para todos los managers.
+
+    Todo salvo config.json es independiente del manager, así que el ZIP base
+    se comprime una sola vez y cada descarga solo anexa su config.json.
+    """
+    buffer = io.BytesIO()
+
+    # compresslevel=1: sobre ~30 KB de ASCII, DEFLATE nivel 6 gasta CPU por
+    # un ahorro de bytes irrelevante en LAN; los textos chicos van ZIP_STORED
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1, strict_timestamps=False) as zipf:
+        # Agregar archivos del scanner
+        if os.path.isdir(scanner_path):
+            _write_tree(zipf, scanner_path)
+        else:
+            # Si no existe, crear estructura básica
+            zipf.writestr(_zip_info("src/main.py", zipfile.ZIP_DEFLATED), _BASIC_SCANNER_BYTES)
+            zipf.writestr(_zip_info("src/__init__.py"), b"")
+
+        # Agregar scripts de instalación y ejecución
+        zipf.writestr(_zip_info("_check_env.bat"), _CHECK_ENV_SCRIPT_BYTES)
+        zipf.writestr(_zip_info("install.bat"), _INSTALL_SCRIPT_BYTES)
+        zipf.writestr(_zip_info("run_scanner.bat"), _RUN_SCRIPT_BYTES)
+        zipf.writestr(_zip_info("install_service.bat"), _SERVICE_SCRIPT_BYTES)
+
+        # Agregar requirements
+        zipf.writestr(_zip_info("requirements.txt"), _REQUIREMENTS_BYTES)
+
+        # Agregar README
+        zipf.writestr(_zip_info("README.txt"), _README_BYTES)
+
+    return buffer.getvalue()
+
+@functools.lru_cache(maxsize=4)
+def _build_exe_static_zip_bytes(scanner_path: str) -> bytes:
+    """Construye (una vez) la parte estática del paquete ejecutable.
+
+    Fuentes, spec, script de build y README son idénticos para todos los
+    managers; cada descarga solo anexa su config.json.
+    """
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1, strict_timestamps=False) as zipf:
+        # Agregar fuentes del scanner bajo src/
+        src_dir = os.path.join(scanner_path, "src")
+        if os.path.isdir(src_dir):
+            _write_tree(zipf, src_dir, prefix="src/")
+        else:
+            # Crear scanner básico
+            zipf.writestr(_zip_info("src/main.py", zipfile.ZIP_DEFLATED), _BASIC_SCANNER_BYTES)
+
+        # Agregar spec file para PyInstaller
+        zipf.writestr(_zip_info("scanner.spec"), _PYINSTALLER_SPEC_BYTES)
+
+        # Agregar scripts de build
+        zipf.writestr(_zip_info("build_executable.bat"), _BUILD_SCRIPT_BYTES)
+
+        # Agregar README para ejecutable
+        zipf.writestr(_zip_info("README_EXECUTABLE.txt"), _EXECUTABLE_README_BYTES)
+
+    return buffer.getvalue()
+
+class AgentPackager:
+    """Maneja el empaquetado del agente scanner para distribución"""
+    
+    def __init__(self, scanner_path: str = "scanner-agent"):
+        self.scanner_path = Path(scanner_path)
+        # Ruta como str plano: las rutas calientes usan os.path en lugar de
+        # pathlib (cada operador / crea un PurePath nuevo); Path queda solo
+        # como atributo de la API pública
+        self._scanner_root = os.fspath(self.scanner_path)
+        # Plantillas ya comprimidas de las entradas estáticas: el DEFLATE se
+        # paga al construir (y una sola vez por proceso via lru_cache), no
+        # en medio de una descarga
+        self._template_bytes = _build_static_zip_bytes(self._scanner_root)
+        self._exe_template_bytes = _build_exe_static_zip_bytes(self._scanner_root)
+    
+    def create_agent_package(self, manager_id: str, api_base_url: str = "http://localhost:8000/api/v1") -> bytes:
+        """
+        Crea un paquete ZIP con el agente scanner personalizado
+        
+        Args:
+            manager_id: ID del manager para configurar el agente
+            api_base_url: URL base de la API
+            
+        Returns:
+            Bytes del archivo ZIP
+        """
+        # Partir de la plantilla pre-comprimida y anexar solo config.json:
+        # las entradas del template se copian crudas (sin re-DEFLATE), el
+        # único payload nuevo por descarga es la config
+        buffer = io.BytesIO(self._template_bytes)
+
+        with zipfile.ZipFile(buffer, 'a', strict_timestamps=False) as zipf:
+            config = self._create_config(manager_id, api_base_url)
+            zipf.writestr(_zip_info("config.json"), orjson.dumps(config))
+
+        return buffer.getvalue()
+
+    async def create_agent_package_async(self, manager_id: str, api_base_url: str = "http://localhost:8000/api/v1") -> bytes:
+        """Versión async: corre el empaquetado en un hilo para no bloquear
+        el event loop con el DEFLATE de config.json y las copias de buffers."""
+        return await asyncio.to_thread(self.create_agent_package, manager_id, api_base_url)
+
+    def create_executable_package(self, manager_id: str, api_base_url: str = "http://localhost:8000/api/v1") -> bytes:
+        """
+        Crea un paquete con ejecutable compilado usando PyInstaller
+        
+        Args:
+            manager_id: ID del manager para configurar el agente
+            api_base_url: URL base de la API
+            
+        Returns:
+            Bytes del archivo ZIP con el ejecutable
+        """
+        # Partir de la plantilla pre-comprimida (fuentes + spec + scripts)
+        # y anexar solo config.json, igual que en create_agent_package
+        buffer = io.BytesIO(self._exe_template_bytes)
+
+        with zipfile.ZipFile(buffer, 'a', strict_timestamps=False) as zipf:
+            config = self._create_config(manager_id, api_base_url)
+            zipf.writestr(_zip_info("config.json"), orjson.dumps(config))
+
+        return buffer.getvalue()
+
+    async def create_executable_package_async(self, manager_id: str, api_base_url: str = "http://localhost:8000/api/v1") -> bytes:
+        """Versión async: delega a un hilo la lectura de fuentes y el DEFLATE."""
+        return await asyncio.to_thread(self.create_executable_package, manager_id, api_base_url)
+
+    def _create_config(self, manager_id: str, api_base_url: str) -> Dict[str, Any]:
+        """Crea la configuración personalizada para el agente"""
+        return {**_CONFIG_TEMPLATE, "manager_id": manager_id, "api_base_url": api_base_url}
+    
+    def _create_install_script(self) -> bytes:
+        """Crea el script de instalación para Windows"""
+        return _INSTALL_SCRIPT_BYTES
+
+    def _create_run_script(self) -> bytes:
+        """Crea el script para ejecutar el scanner"""
+        return _RUN_SCRIPT_BYTES
+
+    def _create_service_script(self) -> bytes:
+        """Crea el script para instalar como servicio de Windows"""
+        return _SERVICE_SCRIPT_BYTES
+
+    def _create_build_script(self) -> bytes:
+        """Crea el script para compilar el ejecutable"""
+        return _BUILD_SCRIPT_BYTES
+
+    def _create_pyinstaller_spec(self) -> bytes:
+        """Crea el archivo .spec para PyInstaller"""
+        return _PYINSTALLER_SPEC_BYTES
+
+    def _get_requirements(self) -> bytes:
+        """Retorna las dependencias necesarias"""
+        return _REQUIREMENTS_BYTES
+
+    def _create_readme(self) -> bytes:
+        """Crea el archivo README"""
+        return _README_BYTES
+
+    def _create_executable_readme(self) -> bytes:
+        """Crea el README para la versión ejecutable"""
+        return _EXECUTABLE_README_BYTES
+
+    def _create_basic_scanner(self) -> bytes:
+        """Crea un scanner básico si no existe el código fuente"""
+        return _BASIC_SCANNER_BYTES
+
+    def _generate_install_script(self) -> bytes:
+        return _EXE_INSTALL_SCRIPT_BYTES
@@ -1,178 +1,224 @@
-from typing import List, Dict, Any
-from datetime import datetime
+from itertools import chain
+from typing import List, Dict, Any, Iterator, Optional
+from datetime import datetime, timezone
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 from ..models import Threat
 
+def _build_automaton(words):
+    """Compila una lista de literales en un autómata Aho-Corasick.
+
+    Un solo recorrido del texto en C reemplaza el `any(w in text ...)` que
+    escanea el texto una vez por patrón en Python. Devuelve None si
+    pyahocorasick no está instalado (los llamadores caen al escaneo simple).
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
 class ThreatAnalyzer:
     def __init__(self):
-        self.suspicious_ports = [1337, 31337, 4444, 5555, 6666, 7777, 8888, 9999]
+        # frozenset: membresía O(1) por hash en el chequeo por puerto, en
+        # lugar del escaneo lineal de una lista
+        self.suspicious_ports = frozenset((1337, 31337, 4444, 5555, 6666, 7777, 8888, 9999))
         self.malicious_processes = [
             "netcat", "nc", "mimikatz", "psexec", "wce", "fgdump",
             "pwdump", "gsecdump", "cachedump", "lsadump"
         ]
         self.dangerous_extensions = [
-            ".exe.pdf", ".pdf.exe", ".doc.exe", ".jpg.exe", 
+            ".exe.pdf", ".pdf.exe", ".doc.exe", ".jpg.exe",
             ".png.exe", ".txt.exe", ".scr", ".pif", ".bat.exe"
         ]
-    
+        self.suspicious_paths = [
+            "temp", "tmp", "appdata\\local\\temp", "programdata"
+        ]
+        # Autómatas precompilados (una vez por instancia; la instancia es
+        # compartida a nivel de módulo en los routers)
+        self._proc_automaton = _build_automaton(self.malicious_processes)
+        self._path_automaton = _build_automaton(self.suspicious_paths)
+        # Las extensiones son sufijos, no substrings arbitrarios:
+        # endswith(tuple) corre en C y corta en el primer match
+        self._ext_suffixes = tuple(self.dangerous_extensions)
+
+    @staticmethod
+    def _first_match(automaton, words, text: str) -> Optional[str]:
+        """Primer patrón de `words` presente en `text`."""
+        if automaton is not None:
+            for _, word in automaton.iter(text):
+                return word
+            return None
+        for word in words:
+            if word in text:
+                return word
+        return None
+
+    @staticmethod
+    def _all_matches(automaton, words, text: str) -> List[str]:
+        """Patrones de `words` presentes en `text`, en el orden de `words`."""
+        if automaton is not None:
+            found = {word for _, word in automaton.iter(text)}
+            return [word for word in words if word in found]
+        return [word for word in words if word in text]
+
     def analyze_scan_data(self, machine_id: str, scan_data: Dict[str, Any]) -> List[Threat]:
-        threats = []
-        
-        # Analizar puertos abiertos
-        threats.extend(self._analyze_open_ports(machine_id, scan_data.get("security_scan", {}).get("open_ports", [])))
-        
-        # Analizar cuentas de usuario
-        threats.extend(self._analyze_user_accounts(machine_id, scan_data.get("security_scan", {}).get("user_accounts", [])))
-        
-        # Analizar archivo hosts
-        threats.extend(self._analyze_hosts_file(machine_id, scan_data.get("security_scan", {}).get("hosts_file", {})))
-        
-        # Analizar eventos de seguridad
-        threats.extend(self._analyze_security_events(machine_id, scan_data.get("security_scan", {}).get("security_events", [])))
-        
-        # Analizar archivos recientes
-        threats.extend(self._analyze_recent_files(machine_id, scan_data.get("activity_scan", {}).get("recent_files", [])))
-        
-        # Analizar tareas programadas
-        threats.extend(self._analyze_scheduled_tasks(machine_id, scan_data.get("system_health", {}).get("scheduled_tasks", [])))
-        
-        # Analizar variables de entorno
-        threats.extend(self._analyze_environment_variables(machine_id, scan_data.get("system_health", {}).get("environment_variables", {})))
-        
-        return threats
-    
-    def _analyze_open_ports(self, machine_id: str, open_ports: List[Dict]) -> List[Threat]:
-        threats = []
+        # Un solo timestamp para todo el análisis: todas las amenazas de un
+        # mismo escaneo comparten legítimamente el momento de detección.
+        # now(timezone.utc) evita el deprecado utcnow(); el tzinfo se quita
+        # porque las columnas DateTime del modelo guardan UTC naive
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        # Cada sub-dict se resuelve una sola vez (los defaults son tuplas/
+        # dicts vacíos solo cuando la sección falta)
+        security = scan_data.get("security_scan") or {}
+        activity = scan_data.get("activity_scan") or {}
+        health = scan_data.get("system_health") or {}
+
+        # Los helpers son generadores: una sola lista final en lugar de
+        # siete listas intermedias + siete extend
+        return list(chain(
+            self._analyze_open_ports(machine_id, security.get("open_ports", ()), now),
+            self._analyze_user_accounts(machine_id, security.get("user_accounts", ()), now),
+            self._analyze_hosts_file(machine_id, security.get("hosts_file") or {}, now),
+            self._analyze_security_events(machine_id, security.get("security_events", ()), now),
+            self._analyze_recent_files(machine_id, activity.get("recent_files", ()), now),
+            self._analyze_scheduled_tasks(machine_id, health.get("scheduled_tasks", ()), now),
+            self._analyze_environment_variables(machine_id, health.get("environment_variables") or {}, now),
+        ))
+
+    def _analyze_open_ports(self, machine_id: str, open_ports: List[Dict], now: datetime) -> Iterator[Threat]:
         for port_info in open_ports:
             port = port_info.get("port")
             process_name = port_info.get("process_name", "").lower()
-            
+
             if port in self.suspicious_ports:
-                threats.append(Threat(
+                yield Threat(
                     machine_id=machine_id,
                     threat_type="PUERTO_SOSPECHOSO",
                     description=f"Puerto sospechoso {port} abierto por {process_name}",
                     evidence=port_info,
-                    detected_at=datetime.utcnow()
-                ))
-            
-            if any(malware in process_name for malware in self.malicious_processes):
-                threats.append(Threat(
+                    detected_at=now
+                )
+
+            if self._first_match(self._proc_automaton, self.malicious_processes, process_name):
+                yield Threat(
                     machine_id=machine_id,
                     threat_type="PROCESO_MALICIOSO",
                     description=f"Proceso potencialmente malicioso detectado: {process_name}",
                     evidence=port_info,
-                    detected_at=datetime.utcnow()
-                ))
-        
-        return threats
-    
-    def _analyze_user_accounts(self, machine_id: str, user_accounts: List[Dict]) -> List[Threat]:
-        threats = []
-        admin_count = sum(1 for user in user_accounts if user.get("is_admin", False))
-        
+                    detected_at=now
+                )
+
+    def _analyze_user_accounts(self, machine_id: str, user_accounts: List[Dict], now: datetime) -> Iterator[Threat]:
+        # Una sola pasada acumula el conteo de admins y las cuentas sin
+        # contraseña en lugar de recorrer la lista dos veces
+        admin_count = 0
+        no_password = []
+        for user in user_accounts:
+            if user.get("is_admin", False):
+                admin_count += 1
+            if not user.get("password_required", True):
+                no_password.append(user)
+
         if admin_count > 3:
-            threats.append(Threat(
+            yield Threat(
                 machine_id=machine_id,
                 threat_type="EXCESO_ADMINISTRADORES",
                 description=f"Demasiadas cuentas de administrador detectadas: {admin_count}",
                 evidence={"admin_count": admin_count, "users": user_accounts},
-                detected_at=datetime.utcnow()
-            ))
-        
-        for user in user_accounts:
-            if not user.get("password_required", True):
-                threats.append(Threat(
-                    machine_id=machine_id,
-                    threat_type="CUENTA_SIN_PASSWORD",
-                    description=f"Cuenta sin contraseña: {user.get('username')}",
-                    evidence=user,
-                    detected_at=datetime.utcnow()
-                ))
-        
-        return threats
-    
-    def _analyze_hosts_file(self, machine_id: str, hosts_data: Dict) -> List[Threat]:
-        threats = []
+                detected_at=now
+            )
+
+        for user in no_password:
+            yield Threat(
+                machine_id=machine_id,
+                threat_type="CUENTA_SIN_PASSWORD",
+                description=f"Cuenta sin contraseña: {user.get('username')}",
+                evidence=user,
+                detected_at=now
+            )
+
+    def _analyze_hosts_file(self, machine_id: str, hosts_data: Dict, now: datetime) -> Iterator[Threat]:
         suspicious_entries = hosts_data.get("suspicious_entries", [])
-        
+
+        # Cada amenaza lleva solo su entrada y el total: adjuntar hosts_data
+        # completo duplicaba las N entradas en cada una de las N filas (y en
+        # su JSON almacenado/exportado)
+        total_entries = len(suspicious_entries)
         for entry in suspicious_entries:
-            threats.append(Threat(
+            yield Threat(
                 machine_id=machine_id,
                 threat_type="HOSTS_MODIFICADO",
                 description=f"Entrada sospechosa en archivo hosts: {entry}",
-                evidence=hosts_data,
-                detected_at=datetime.utcnow()
-            ))
-        
-        return threats
-    
-    def _analyze_security_events(self, machine_id: str, security_events: List[Dict]) -> List[Threat]:
-        threats = []
-        failed_logins = [event for event in security_events if event.get("event_id") == 4625]
-        
-        if len(failed_logins) > 10:
-            threats.append(Threat(
+                evidence={"entry": entry, "total_suspicious_entries": total_entries},
+                detected_at=now
+            )
+
+    def _analyze_security_events(self, machine_id: str, security_events: List[Dict], now: datetime) -> Iterator[Threat]:
+        # Solo se reportan el conteo y 5 muestras: contar en streaming evita
+        # materializar la lista completa de eventos 4625
+        failed_count = 0
+        samples = []
+        for event in security_events:
+            if event.get("event_id") == 4625:
+                failed_count += 1
+                if len(samples) < 5:
+                    samples.append(event)
+
+        if failed_count > 10:
+            yield Threat(
                 machine_id=machine_id,
                 threat_type="MULTIPLES_INTENTOS_LOGIN",
-                description=f"Múltiples intentos de login fallidos detectados: {len(failed_logins)}",
-                evidence={"failed_login_count": len(failed_logins), "events": failed_logins[:5]},
-                detected_at=datetime.utcnow()
-            ))
-        
-        return threats
-    
-    def _analyze_recent_files(self, machine_id: str, recent_files: List[Dict]) -> List[Threat]:
-        threats = []
-        
+                description=f"Múltiples intentos de login fallidos detectados: {failed_count}",
+                evidence={"failed_login_count": failed_count, "events": samples},
+                detected_at=now
+            )
+
+    def _analyze_recent_files(self, machine_id: str, recent_files: List[Dict], now: datetime) -> Iterator[Threat]:
         for file_info in recent_files:
             file_name = file_info.get("name", "").lower()
-            
-            if any(ext in file_name for ext in self.dangerous_extensions):
-                threats.append(Threat(
+
+            if file_name.endswith(self._ext_suffixes):
+                yield Threat(
                     machine_id=machine_id,
                     threat_type="ARCHIVO_SOSPECHOSO",
                     description=f"Archivo con extensión sospechosa: {file_name}",
                     evidence=file_info,
-                    detected_at=datetime.utcnow()
-                ))
-        
-        return threats
-    
-    def _analyze_scheduled_tasks(self, machine_id: str, scheduled_tasks: List[Dict]) -> List[Threat]:
-        threats = []
-        
+                    detected_at=now
+                )
+
+    def _analyze_scheduled_tasks(self, machine_id: str, scheduled_tasks: List[Dict], now: datetime) -> Iterator[Threat]:
         for task in scheduled_tasks:
             task_name = task.get("name", "").lower()
             command = task.get("command", "").lower()
-            
-            if any(malware in command for malware in self.malicious_processes):
-                threats.append(Threat(
+
+            if self._first_match(self._proc_automaton, self.malicious_processes, command):
+                yield Threat(
                     machine_id=machine_id,
                     threat_type="TAREA_MALICIOSA",
                     description=f"Tarea programada sospechosa: {task_name}",
                     evidence=task,
-                    detected_at=datetime.utcnow()
-                ))
-        
-        return threats
-    
-    def _analyze_environment_variables(self, machine_id: str, env_vars: Dict) -> List[Threat]:
-        threats = []
+                    detected_at=now
+                )
+
+    def _analyze_environment_variables(self, machine_id: str, env_vars: Dict, now: datetime) -> Iterator[Threat]:
         path_var = env_vars.get("PATH", "")
-        
-        suspicious_paths = [
-            "temp", "tmp", "appdata\\local\\temp", "programdata"
-        ]
-        
-        for suspicious_path in suspicious_paths:
-            if suspicious_path in path_var.lower():
-                threats.append(Threat(
-                    machine_id=machine_id,
-                    threat_type="PATH_MODIFICADO",
-                    description=f"PATH contiene ruta sospechosa: {suspicious_path}",
-                    evidence={"path": path_var, "suspicious_path": suspicious_path},
-                    detected_at=datetime.utcnow()
-                ))
-        
-        return threats
\ No newline at end of file
+
+        # Un solo escaneo del PATH en lugar de un recorrido por patrón
+        for suspicious_path in self._all_matches(
+            self._path_automaton, self.suspicious_paths, path_var.lower()
+        ):
+            yield Threat(
+                machine_id=machine_id,
+                threat_type="PATH_MODIFICADO",
+                description=f"PATH contiene ruta sospechosa: {suspicious_path}",
+                evidence={"path": path_var, "suspicious_path": suspicious_path},
+                detected_at=now
+            )
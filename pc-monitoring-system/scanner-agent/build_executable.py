@@ -2,12 +2,15 @@
 
 import os
 import sys
-import shutil
-import subprocess
 import argparse
 from pathlib import Path
 
+# shutil y subprocess se importan dentro de cada función que los usa: las
+# invocaciones --spec-only / --help no pagan su costo de arranque
+
 def install_pyinstaller():
+    import subprocess
+
     try:
         import PyInstaller
         print("✓ PyInstaller ya está instalado")
@@ -90,6 +93,9 @@ exe = EXE(
     print("✓ Archivo .spec creado")
 
 def build_executable():
+    import shutil
+    import subprocess
+
     print("Construyendo ejecutable...")
     
     try:
@@ -113,6 +119,8 @@ def build_executable():
         return False
 
 def create_installer_package():
+    import shutil
+
     print("Creando paquete de instalación...")
     
     package_dir = Path('package')
@@ -172,6 +180,8 @@ pause
     return True
 
 def create_zip_package():
+    import shutil
+
     print("Creando archivo ZIP...")
     
     try:
@@ -183,6 +193,8 @@ def create_zip_package():
         return False
 
 def cleanup():
+    import shutil
+
     print("Limpiando archivos temporales...")
     
     temp_files = ['scanner_agent.spec', 'build', 'dist']
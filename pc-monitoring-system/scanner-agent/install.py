@@ -4,10 +4,12 @@ import os
 import sys
 import json
 import argparse
-import subprocess
 from pathlib import Path
 
 def install_dependencies():
+    # Import diferido: --test-only no necesita subprocess
+    import subprocess
+
     print("Instalando dependencias...")
     
     try:
@@ -4,21 +4,54 @@ import json
 import logging
 from typing import Dict, Any, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson serializa en C (2-5x más rápido que json) y devuelve bytes listos
+# para el body; sin la dependencia se cae al json estándar
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+    _loads = json.loads
+
+# Sesión HTTP compartida por todos los APIClient del proceso: reutilizar
+# las conexiones keep-alive evita el handshake TCP(+TLS) en cada llamada de
+# la secuencia register -> send_scan -> check_tasks (el agente usa una sola
+# configuración por proceso, así que los headers son los mismos)
+_shared_session: Optional[aiohttp.ClientSession] = None
+_session_lock = asyncio.Lock()
+
 class APIClient:
-    
+
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.session = None
-    
+
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self.session is None or self.session.closed:
-            timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(
-                timeout=timeout,
-                headers=self.config.get_headers()
-            )
-        return self.session
+        global _shared_session
+        if _shared_session is None or _shared_session.closed:
+            async with _session_lock:
+                if _shared_session is None or _shared_session.closed:
+                    timeout = aiohttp.ClientTimeout(total=30)
+                    connector = aiohttp.TCPConnector(
+                        limit=10,
+                        keepalive_timeout=60,
+                        ttl_dns_cache=300,
+                        enable_cleanup_closed=True
+                    )
+                    _shared_session = aiohttp.ClientSession(
+                        timeout=timeout,
+                        connector=connector,
+                        headers=self.config.get_headers()
+                    )
+        self.session = _shared_session
+        return _shared_session
     
     async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict[str, Any]:
         url = f"{self.config.api_base_url}{endpoint}"
@@ -28,17 +61,23 @@ class APIClient:
             
             kwargs = {}
             if data:
-                kwargs['json'] = data
-            
+                # Serializar aquí con orjson en lugar de json= evita el
+                # json.dumps interno de aiohttp sobre payloads grandes
+                kwargs['data'] = _dumps(data)
+                kwargs['headers'] = {'Content-Type': 'application/json'}
+
             async with session.request(method, url, **kwargs) as response:
-                response_text = await response.text()
-                
+                # read() entrega bytes crudos; el decode utf-8 completo solo
+                # se paga si la respuesta no es JSON o hay que loguear error
+                body = await response.read()
+
                 if response.status == 200:
                     try:
-                        return json.loads(response_text)
-                    except json.JSONDecodeError:
-                        return {'success': True, 'data': response_text}
+                        return _loads(body)
+                    except ValueError:
+                        return {'success': True, 'data': body.decode(errors='replace')}
                 else:
+                    response_text = body.decode(errors='replace')
                     self.logger.error(f"Error HTTP {response.status}: {response_text}")
                     return {
                         'success': False,
@@ -107,6 +146,21 @@ class APIClient:
         
         return response
     
+    async def run_cycle(self, scan_data: Dict[str, Any]) -> tuple:
+        """Ejecuta registro, envío de escaneo y chequeo de tareas en paralelo.
+
+        Las tres llamadas son independientes (el servidor hace upsert de la
+        máquina al ingerir el escaneo), así que lanzarlas con gather cuesta
+        un solo RTT en lugar de tres awaits secuenciales. Devuelve la tupla
+        (registro, envío, tareas); las excepciones vienen como valores.
+        """
+        return await asyncio.gather(
+            self.register_machine(),
+            self.send_scan_data(scan_data),
+            self.check_tasks(),
+            return_exceptions=True
+        )
+
     async def get_scan_result_url(self, scan_token: str) -> str:
         return f"{self.config.api_base_url}/agent/scan-result/{scan_token}"
     
@@ -128,17 +182,13 @@ class APIClient:
             return False
     
     async def close(self):
+        """Cierre explícito de la sesión compartida (fin del proceso agente).
+
+        No hay __del__: cerrar desde un destructor re-entraba al event loop
+        (riesgo de deadlock y deprecado en CPython recientes) y, con la
+        sesión compartida a nivel de módulo, un GC de una instancia cortaría
+        las conexiones de las demás.
+        """
         if self.session and not self.session.closed:
             await self.session.close()
-            self.logger.debug("Sesión HTTP cerrada")
-    
-    def __del__(self):
-        if hasattr(self, 'session') and self.session and not self.session.closed:
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    loop.create_task(self.session.close())
-                else:
-                    loop.run_until_complete(self.session.close())
-            except:
-                pass
\ No newline at end of file
+            self.logger.debug("Sesión HTTP cerrada")
\ No newline at end of file
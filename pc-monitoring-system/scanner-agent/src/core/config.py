@@ -4,6 +4,11 @@ import uuid
 from pathlib import Path
 from typing import Dict, Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 class Config:
     
     def __init__(self):
@@ -11,18 +16,20 @@ class Config:
         self.load_config()
     
     def _get_config_file_path(self) -> Path:
-        base_dir = Path(__file__).parent.parent.parent
-        
-        config_paths = [
-            base_dir / "config.json",
-            base_dir / "config" / "config.json"
+        # Sondeo con os.path: evita construir un Path y pagar su maquinaria
+        # de stat por candidato en cada arranque del agente
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        candidates = [
+            os.path.join(base_dir, "config.json"),
+            os.path.join(base_dir, "config", "config.json")
         ]
-        
-        for path in config_paths:
-            if path.exists():
-                return path
-        
-        return config_paths[0]
+
+        for path in candidates:
+            if os.path.exists(path):
+                return Path(path)
+
+        return Path(candidates[0])
     
     def load_config(self):
         default_config = {
@@ -40,9 +47,11 @@ class Config:
         
         if self.config_file.exists():
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    file_config = json.load(f)
-                    default_config.update(file_config)
+                # orjson parsea en C; el json estándar queda como fallback
+                with open(self.config_file, 'rb') as f:
+                    raw = f.read()
+                file_config = orjson.loads(raw) if orjson is not None else json.loads(raw)
+                default_config.update(file_config)
             except Exception as e:
                 print(f"Error al cargar configuración: {e}")
                 print("Usando configuración por defecto")
@@ -60,6 +69,16 @@ class Config:
         
         if not self.manager_id:
             raise ValueError("manager_id no está configurado. El agente debe ser configurado por un Cliente-Gerente.")
+
+        # Los headers solo dependen de campos que no cambian tras la carga
+        # (update_from_server toca únicamente los intervalos), así que el
+        # dict se arma una vez en lugar de por cada apertura de sesión
+        self._headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': f'ScannerAgent/1.0 (Machine: {self.machine_name})',
+            'X-Manager-ID': self.manager_id,
+            'X-Machine-ID': self.machine_id
+        }
     
     def save_config(self):
         config_data = {
@@ -77,9 +96,13 @@ class Config:
         
         try:
             self.config_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=2, ensure_ascii=False)
+
+            if orjson is not None:
+                serialized = orjson.dumps(config_data, option=orjson.OPT_INDENT_2)
+            else:
+                serialized = json.dumps(config_data, indent=2, ensure_ascii=False).encode('utf-8')
+            with open(self.config_file, 'wb') as f:
+                f.write(serialized)
         except Exception as e:
             print(f"Error al guardar configuración: {e}")
     
@@ -100,12 +123,7 @@ class Config:
             self.save_config()
     
     def get_headers(self) -> Dict[str, str]:
-        return {
-            'Content-Type': 'application/json',
-            'User-Agent': f'ScannerAgent/1.0 (Machine: {self.machine_name})',
-            'X-Manager-ID': self.manager_id,
-            'X-Machine-ID': self.machine_id
-        }
+        return self._headers
     
     def is_configured(self) -> bool:
         return bool(self.manager_id and self.api_base_url)
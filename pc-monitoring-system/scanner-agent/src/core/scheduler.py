@@ -1,91 +1,117 @@
+import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 class ScanScheduler:
-    
+
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        # Los datetimes se conservan solo para mostrar/serializar; la
+        # aritmética de intervalos corre sobre el reloj monotónico, que es
+        # más barato que datetime.now() e inmune a saltos del reloj de
+        # pared (NTP, cambio de hora)
         self.last_scan_time: Optional[datetime] = None
         self.next_scan_time: Optional[datetime] = None
+        self._next_deadline: Optional[float] = None
+        # Señal para despertar al bucle principal cuando se fuerza un
+        # escaneo, en lugar de esperar al siguiente tick del sondeo
+        self.force_scan_event = asyncio.Event()
         self._calculate_next_scan()
-    
-    def _calculate_next_scan(self):
+
+    def _calculate_next_scan(self, now: Optional[float] = None):
+        if now is None:
+            now = time.monotonic()
+
         if self.last_scan_time is None:
+            self._next_deadline = now
             self.next_scan_time = datetime.now()
         else:
             interval = timedelta(minutes=self.config.scan_interval_minutes)
-            self.next_scan_time = self.last_scan_time + interval
-        
+            self._next_deadline = now + interval.total_seconds()
+            self.next_scan_time = datetime.now() + interval
+
         self.logger.debug(f"Próximo escaneo programado para: {self.next_scan_time}")
-    
-    def should_scan(self) -> bool:
-        if self.next_scan_time is None:
+
+    def should_scan(self, now: Optional[float] = None) -> bool:
+        if self._next_deadline is None:
             return True
-        
-        now = datetime.now()
-        should_scan = now >= self.next_scan_time
-        
+
+        # El bucle principal pasa un monotonic() cacheado por iteración
+        # para no releer el reloj en cada consulta del mismo tick
+        if now is None:
+            now = time.monotonic()
+        should_scan = now >= self._next_deadline
+
         if should_scan:
             self.logger.info("Es hora de realizar un escaneo programado")
-        
+
         return should_scan
-    
-    def mark_scan_completed(self):
+
+    def mark_scan_completed(self, now: Optional[float] = None):
+        if now is None:
+            now = time.monotonic()
         self.last_scan_time = datetime.now()
-        self._calculate_next_scan()
-        
+        self._calculate_next_scan(now)
+
         self.logger.info(f"Escaneo completado. Próximo escaneo: {self.next_scan_time}")
-    
+
     def force_next_scan(self):
+        self._next_deadline = time.monotonic()
         self.next_scan_time = datetime.now()
+        self.force_scan_event.set()
         self.logger.info("Escaneo forzado para ejecución inmediata")
-    
-    def get_time_until_next_scan(self) -> timedelta:
-        if self.next_scan_time is None:
+
+    def get_time_until_next_scan(self, now: Optional[float] = None) -> timedelta:
+        if self._next_deadline is None:
             return timedelta(0)
-        
-        now = datetime.now()
-        if now >= self.next_scan_time:
+
+        if now is None:
+            now = time.monotonic()
+        remaining = self._next_deadline - now
+        if remaining <= 0:
             return timedelta(0)
-        
-        return self.next_scan_time - now
-    
-    def get_next_scan_info(self) -> dict:
-        time_until = self.get_time_until_next_scan()
-        
+
+        return timedelta(seconds=remaining)
+
+    def get_next_scan_info(self, now: Optional[float] = None) -> dict:
+        if now is None:
+            now = time.monotonic()
+        time_until = self.get_time_until_next_scan(now)
+
         return {
             'next_scan_time': self.next_scan_time.isoformat() if self.next_scan_time else None,
             'last_scan_time': self.last_scan_time.isoformat() if self.last_scan_time else None,
             'time_until_next_scan_seconds': int(time_until.total_seconds()),
             'scan_interval_minutes': self.config.scan_interval_minutes,
-            'should_scan_now': self.should_scan()
+            'should_scan_now': self.should_scan(now)
         }
-    
+
     def update_interval(self, new_interval_minutes: int):
         old_interval = self.config.scan_interval_minutes
         self.config.scan_interval_minutes = new_interval_minutes
-        
+
         self._calculate_next_scan()
-        
+
         self.logger.info(f"Intervalo de escaneo actualizado de {old_interval} a {new_interval_minutes} minutos")
-    
-    def get_status(self) -> str:
-        if self.next_scan_time is None:
+
+    def get_status(self, now: Optional[float] = None) -> str:
+        if self._next_deadline is None:
             return "No programado"
-        
-        time_until = self.get_time_until_next_scan()
-        
+
+        time_until = self.get_time_until_next_scan(now)
+
         if time_until.total_seconds() <= 0:
             return "Listo para escanear"
-        
+
         hours, remainder = divmod(int(time_until.total_seconds()), 3600)
         minutes, seconds = divmod(remainder, 60)
-        
+
         if hours > 0:
             return f"Próximo escaneo en {hours}h {minutes}m"
         elif minutes > 0:
             return f"Próximo escaneo en {minutes}m {seconds}s"
         else:
-            return f"Próximo escaneo en {seconds}s"
\ No newline at end of file
+            return f"Próximo escaneo en {seconds}s"
@@ -4,6 +4,7 @@ import asyncio
 import logging
 import sys
 import os
+import time
 from datetime import datetime
 from typing import Dict, Any
 
@@ -70,9 +71,17 @@ class ScannerAgent:
                 self.logger.info(f"Scanner {scanner_name} completado")
             
             self.logger.info("Enviando datos a la API")
-            response = await self.api_client.send_scan_data(scan_data)
-            
-            if response.get('success'):
+            # run_cycle lanza registro, envío y chequeo de tareas con gather:
+            # un solo RTT en lugar de tres awaits secuenciales. Con
+            # return_exceptions=True los fallos llegan como valores
+            register_response, response, task_info = await self.api_client.run_cycle(scan_data)
+
+            if isinstance(register_response, Exception):
+                self.logger.warning(f"Error al registrar máquina: {str(register_response)}")
+
+            if isinstance(response, Exception):
+                self.logger.error(f"Error al enviar escaneo: {str(response)}")
+            elif response.get('success'):
                 self.logger.info("Escaneo enviado exitosamente")
                 
                 if 'scan_token' in response:
@@ -81,7 +90,14 @@ class ScannerAgent:
                     print(f"📊 Ver resultados en: {self.config.api_base_url}/scan-result/{response['scan_token']}")
             else:
                 self.logger.error(f"Error al enviar escaneo: {response.get('error', 'Error desconocido')}")
-                
+
+            # El chequeo de tareas viajó en el mismo ciclo: aplicar las
+            # actualizaciones de configuración aquí (should_scan se ignora
+            # porque el escaneo acaba de ejecutarse)
+            if isinstance(task_info, dict) and 'config_updates' in task_info:
+                self.config.update_from_server(task_info['config_updates'])
+                self.logger.info("Configuración actualizada desde el servidor")
+
         except Exception as e:
             self.logger.error(f"Error durante el escaneo: {str(e)}")
             raise
@@ -107,13 +123,36 @@ class ScannerAgent:
         while True:
             try:
                 await self.check_for_tasks()
-                
-                if self.scheduler.should_scan():
+
+                # Una sola lectura del reloj monotónico por iteración,
+                # compartida por todas las consultas al scheduler
+                now = time.monotonic()
+
+                if self.scheduler.should_scan(now):
                     await self.perform_scan()
                     self.scheduler.mark_scan_completed()
-                
-                await asyncio.sleep(self.config.check_interval)
-                
+                    # El escaneo pudo tardar minutos: refrescar el reloj
+                    # para no inflar la espera siguiente
+                    now = time.monotonic()
+
+                # Esperar al evento en lugar de dormir a cadencia fija: el
+                # proceso solo despierta cuando toca el próximo escaneo, el
+                # próximo sondeo de tareas al servidor (check_interval sigue
+                # como cota para no perder órdenes remotas) o un escaneo
+                # forzado que corta la espera de inmediato
+                delay = min(
+                    self.scheduler.get_time_until_next_scan(now).total_seconds(),
+                    self.config.check_interval
+                )
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(
+                            self.scheduler.force_scan_event.wait(), timeout=delay
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                self.scheduler.force_scan_event.clear()
+
             except KeyboardInterrupt:
                 self.logger.info("Deteniendo agente por solicitud del usuario")
                 break
@@ -1,33 +1,78 @@
 import asyncio
+import io
 import logging
 import psutil
 import socket
-import subprocess
+import sys
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 
 class NetworkScanner:
-    
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+
+    async def _run_command(self, cmd: List[str], timeout: float) -> Tuple[int, str]:
+        """Ejecuta un comando externo sin bloquear el event loop.
+
+        subprocess.run retenía el loop durante toda la herramienta externa,
+        serializando las sondas pese al gather; con el subproceso asyncio la
+        espera cede el control y los comandos corren de verdad en paralelo.
+        Devuelve (returncode, stdout decodificado).
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.communicate()
+            raise
+        return proc.returncode, stdout.decode(errors='replace')
     
     async def scan(self) -> Dict[str, Any]:
         self.logger.info("Iniciando escaneo de red")
         
         try:
+            # Una sola enumeración de conexiones por escaneo: en Windows
+            # net_connections recorre todos los endpoints vía iphlpapi, así
+            # que llamarla dos veces (conexiones + puertos) duplicaba el
+            # trabajo de kernel
+            connections_snapshot, process_names = self._snapshot_connections()
+
+            # Las nueve sondas son independientes: gather las solapa y el
+            # tiempo total pasa de la suma de latencias (cada comando externo
+            # cuesta decenas/cientos de ms) al máximo de ellas
+            (interfaces, connections, listening_ports, routing_table,
+             dns_config, firewall_status, wifi_networks, network_shares,
+             network_statistics) = await asyncio.gather(
+                self._get_network_interfaces(),
+                self._get_active_connections(connections_snapshot, process_names),
+                self._get_listening_ports(connections_snapshot, process_names),
+                self._get_routing_table(),
+                self._get_dns_configuration(),
+                self._get_firewall_status(),
+                self._get_wifi_networks(),
+                self._get_network_shares(),
+                self._get_network_statistics()
+            )
+
             network_info = {
                 'timestamp': datetime.utcnow().isoformat(),
-                'interfaces': await self._get_network_interfaces(),
-                'connections': await self._get_active_connections(),
-                'listening_ports': await self._get_listening_ports(),
-                'routing_table': await self._get_routing_table(),
-                'dns_config': await self._get_dns_configuration(),
-                'firewall_status': await self._get_firewall_status(),
-                'wifi_networks': await self._get_wifi_networks(),
-                'network_shares': await self._get_network_shares(),
-                'network_statistics': await self._get_network_statistics()
+                'interfaces': interfaces,
+                'connections': connections,
+                'listening_ports': listening_ports,
+                'routing_table': routing_table,
+                'dns_config': dns_config,
+                'firewall_status': firewall_status,
+                'wifi_networks': wifi_networks,
+                'network_shares': network_shares,
+                'network_statistics': network_statistics
             }
-            
+
             self.logger.info("Escaneo de red completado")
             return network_info
             
@@ -78,11 +123,37 @@ class NetworkScanner:
             self.logger.error(f"Error obteniendo interfaces de red: {str(e)}")
             return []
     
-    async def _get_active_connections(self) -> List[Dict[str, Any]]:
+    def _snapshot_connections(self) -> Tuple[List[Any], Dict[int, str]]:
+        """Captura las conexiones inet una sola vez y resuelve pid -> nombre.
+
+        El mapa de nombres sale de una sola pasada de process_iter, que
+        enumera los procesos en bloque, en lugar de un psutil.Process
+        (OpenProcess + lectura del nombre) por cada pid encontrado en las
+        conexiones. Devuelve (conexiones, nombres).
+        """
+        try:
+            connections = psutil.net_connections(kind='inet')
+        except Exception as e:
+            self.logger.error(f"Error obteniendo conexiones de red: {str(e)}")
+            return [], {}
+
+        try:
+            process_names = {
+                proc.info['pid']: proc.info['name']
+                for proc in psutil.process_iter(['pid', 'name'])
+            }
+        except Exception as e:
+            self.logger.debug(f"Error enumerando procesos: {str(e)}")
+            process_names = {}
+
+        return connections, process_names
+
+    async def _get_active_connections(self, snapshot: List[Any],
+                                      process_names: Dict[int, str]) -> List[Dict[str, Any]]:
         connections = []
-        
+
         try:
-            for conn in psutil.net_connections(kind='inet'):
+            for conn in snapshot:
                 try:
                     connection_info = {
                         'family': conn.family.name if hasattr(conn.family, 'name') else str(conn.family),
@@ -91,39 +162,33 @@ class NetworkScanner:
                         'remote_address': None,
                         'status': conn.status,
                         'pid': conn.pid,
-                        'process_name': None
+                        'process_name': process_names.get(conn.pid)
                     }
-                    
+
                     if conn.laddr:
                         connection_info['local_address'] = f"{conn.laddr.ip}:{conn.laddr.port}"
-                    
+
                     if conn.raddr:
                         connection_info['remote_address'] = f"{conn.raddr.ip}:{conn.raddr.port}"
-                    
-                    if conn.pid:
-                        try:
-                            proc = psutil.Process(conn.pid)
-                            connection_info['process_name'] = proc.name()
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                            pass
-                    
+
                     connections.append(connection_info)
-                    
+
                 except Exception as e:
                     self.logger.debug(f"Error procesando conexión: {str(e)}")
                     continue
-            
+
             return connections
-            
+
         except Exception as e:
             self.logger.error(f"Error obteniendo conexiones activas: {str(e)}")
             return []
-    
-    async def _get_listening_ports(self) -> List[Dict[str, Any]]:
+
+    async def _get_listening_ports(self, snapshot: List[Any],
+                                   process_names: Dict[int, str]) -> List[Dict[str, Any]]:
         listening_ports = []
-        
+
         try:
-            for conn in psutil.net_connections(kind='inet'):
+            for conn in snapshot:
                 if conn.status == psutil.CONN_LISTEN and conn.laddr:
                     port_info = {
                         'port': conn.laddr.port,
@@ -131,37 +196,149 @@ class NetworkScanner:
                         'family': conn.family.name if hasattr(conn.family, 'name') else str(conn.family),
                         'type': conn.type.name if hasattr(conn.type, 'name') else str(conn.type),
                         'pid': conn.pid,
-                        'process_name': None
+                        'process_name': process_names.get(conn.pid)
                     }
-                    
-                    if conn.pid:
-                        try:
-                            proc = psutil.Process(conn.pid)
-                            port_info['process_name'] = proc.name()
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                            pass
-                    
+
                     listening_ports.append(port_info)
-            
+
             return listening_ports
-            
+
         except Exception as e:
             self.logger.error(f"Error obteniendo puertos en escucha: {str(e)}")
             return []
     
+    def _get_routing_table_native(self) -> List[Dict[str, Any]]:
+        """Lee la tabla de rutas con GetIpForwardTable2 (IP Helper API).
+
+        La API devuelve las filas como un arreglo C en menos de un
+        milisegundo, frente a lanzar 'route print' y adivinar columnas
+        sobre decenas de KB de texto (con un timeout de 30 s por si la
+        herramienta se cuelga).
+        """
+        import ctypes
+
+        class SOCKADDR_IN(ctypes.Structure):
+            _fields_ = [
+                ('sin_family', ctypes.c_ushort),
+                ('sin_port', ctypes.c_ushort),
+                ('sin_addr', ctypes.c_ubyte * 4),
+                ('sin_zero', ctypes.c_char * 8)
+            ]
+
+        class SOCKADDR_IN6(ctypes.Structure):
+            _fields_ = [
+                ('sin6_family', ctypes.c_ushort),
+                ('sin6_port', ctypes.c_ushort),
+                ('sin6_flowinfo', ctypes.c_ulong),
+                ('sin6_addr', ctypes.c_ubyte * 16),
+                ('sin6_scope_id', ctypes.c_ulong)
+            ]
+
+        class SOCKADDR_INET(ctypes.Union):
+            _fields_ = [
+                ('Ipv4', SOCKADDR_IN),
+                ('Ipv6', SOCKADDR_IN6),
+                ('si_family', ctypes.c_ushort)
+            ]
+
+        class IP_ADDRESS_PREFIX(ctypes.Structure):
+            _fields_ = [
+                ('Prefix', SOCKADDR_INET),
+                ('PrefixLength', ctypes.c_ubyte)
+            ]
+
+        class MIB_IPFORWARD_ROW2(ctypes.Structure):
+            _fields_ = [
+                ('InterfaceLuid', ctypes.c_ulonglong),
+                ('InterfaceIndex', ctypes.c_ulong),
+                ('DestinationPrefix', IP_ADDRESS_PREFIX),
+                ('NextHop', SOCKADDR_INET),
+                ('SitePrefixLength', ctypes.c_ubyte),
+                ('ValidLifetime', ctypes.c_ulong),
+                ('PreferredLifetime', ctypes.c_ulong),
+                ('Metric', ctypes.c_ulong),
+                ('Protocol', ctypes.c_ulong),
+                ('Loopback', ctypes.c_ubyte),
+                ('AutoconfigureAddress', ctypes.c_ubyte),
+                ('Publish', ctypes.c_ubyte),
+                ('Immortal', ctypes.c_ubyte),
+                ('Age', ctypes.c_ulong),
+                ('Origin', ctypes.c_ulong)
+            ]
+
+        class MIB_IPFORWARD_TABLE2(ctypes.Structure):
+            _fields_ = [
+                ('NumEntries', ctypes.c_ulong),
+                ('Table', MIB_IPFORWARD_ROW2 * 1)
+            ]
+
+        def to_ip(sockaddr_inet):
+            family = sockaddr_inet.si_family
+            if family == socket.AF_INET:
+                return socket.inet_ntop(socket.AF_INET, bytes(sockaddr_inet.Ipv4.sin_addr))
+            if family == socket.AF_INET6:
+                return socket.inet_ntop(socket.AF_INET6, bytes(sockaddr_inet.Ipv6.sin6_addr))
+            return None
+
+        AF_UNSPEC = 0
+        iphlpapi = ctypes.windll.iphlpapi
+        table_ptr = ctypes.POINTER(MIB_IPFORWARD_TABLE2)()
+
+        if iphlpapi.GetIpForwardTable2(AF_UNSPEC, ctypes.byref(table_ptr)) != 0:
+            return []
+
+        try:
+            num_entries = table_ptr.contents.NumEntries
+            rows = ctypes.cast(
+                table_ptr.contents.Table,
+                ctypes.POINTER(MIB_IPFORWARD_ROW2 * num_entries)
+            ).contents
+
+            routes = []
+            for row in rows:
+                prefix = row.DestinationPrefix
+                destination = to_ip(prefix.Prefix)
+                if destination is None:
+                    continue
+
+                if prefix.Prefix.si_family == socket.AF_INET:
+                    mask = (0xffffffff << (32 - prefix.PrefixLength)) & 0xffffffff if prefix.PrefixLength else 0
+                    netmask = socket.inet_ntop(socket.AF_INET, mask.to_bytes(4, 'big'))
+                else:
+                    netmask = str(prefix.PrefixLength)
+
+                routes.append({
+                    'destination': destination,
+                    'netmask': netmask,
+                    'gateway': to_ip(row.NextHop),
+                    'interface': str(row.InterfaceIndex),
+                    'metric': str(row.Metric)
+                })
+
+            return routes
+        finally:
+            iphlpapi.FreeMibTable(table_ptr)
+
     async def _get_routing_table(self) -> List[Dict[str, Any]]:
         routes = []
-        
+
+        if sys.platform == 'win32':
+            try:
+                return self._get_routing_table_native()
+            except Exception as e:
+                self.logger.debug(f"IP Helper API no disponible, usando comandos: {str(e)}")
+
+        # Fallback: parseo de 'route print' para plataformas sin la API
         try:
-            result = subprocess.run([
-                'route', 'print'
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                lines = result.stdout.split('\n')
+            returncode, stdout = await self._run_command(['route', 'print'], 30)
+
+            if returncode == 0:
                 in_routes_section = False
-                
-                for line in lines:
+
+                # StringIO itera línea a línea sin materializar la lista
+                # completa que dejaba split('\n') (texto + lista duplicaban
+                # el pico de memoria de salidas grandes)
+                for line in io.StringIO(stdout):
                     line = line.strip()
                     
                     if 'IPv4 Route Table' in line:
@@ -186,31 +363,124 @@ class NetworkScanner:
             self.logger.error(f"Error obteniendo tabla de enrutamiento: {str(e)}")
             return []
     
+    def _get_dns_servers_native(self) -> List[str]:
+        """Lee los servidores DNS con GetAdaptersAddresses (IP Helper API).
+
+        Devuelve la misma información que parsear 'ipconfig /all', pero en
+        ~1 ms y sin lanzar procesos ni depender del idioma de la salida:
+        la API entrega los servidores como sockaddr estructurados.
+        """
+        import ctypes
+        from ctypes import wintypes
+
+        class SOCKADDR(ctypes.Structure):
+            _fields_ = [
+                ('sa_family', ctypes.c_ushort),
+                ('sa_data', ctypes.c_char * 26)
+            ]
+
+        class SOCKET_ADDRESS(ctypes.Structure):
+            _fields_ = [
+                ('lpSockaddr', ctypes.POINTER(SOCKADDR)),
+                ('iSockaddrLength', ctypes.c_int)
+            ]
+
+        class IP_ADAPTER_DNS_SERVER_ADDRESS(ctypes.Structure):
+            pass
+
+        IP_ADAPTER_DNS_SERVER_ADDRESS._fields_ = [
+            ('Length', ctypes.c_ulong),
+            ('Reserved', wintypes.DWORD),
+            ('Next', ctypes.POINTER(IP_ADAPTER_DNS_SERVER_ADDRESS)),
+            ('Address', SOCKET_ADDRESS)
+        ]
+
+        # Solo se declaran los campos hasta FirstDnsServerAddress; el resto
+        # de la estructura real queda en el buffer y se recorre vía Next
+        class IP_ADAPTER_ADDRESSES(ctypes.Structure):
+            pass
+
+        IP_ADAPTER_ADDRESSES._fields_ = [
+            ('Length', ctypes.c_ulong),
+            ('IfIndex', wintypes.DWORD),
+            ('Next', ctypes.POINTER(IP_ADAPTER_ADDRESSES)),
+            ('AdapterName', ctypes.c_char_p),
+            ('FirstUnicastAddress', ctypes.c_void_p),
+            ('FirstAnycastAddress', ctypes.c_void_p),
+            ('FirstMulticastAddress', ctypes.c_void_p),
+            ('FirstDnsServerAddress', ctypes.POINTER(IP_ADAPTER_DNS_SERVER_ADDRESS))
+        ]
+
+        GAA_FLAG_SKIP = 0x0001 | 0x0002 | 0x0004  # unicast|anycast|multicast
+        ERROR_BUFFER_OVERFLOW = 111
+        AF_UNSPEC = 0
+
+        size = ctypes.c_ulong(15000)
+        while True:
+            buffer = ctypes.create_string_buffer(size.value)
+            result = ctypes.windll.iphlpapi.GetAdaptersAddresses(
+                AF_UNSPEC, GAA_FLAG_SKIP, None, buffer, ctypes.byref(size)
+            )
+            if result == ERROR_BUFFER_OVERFLOW:
+                continue
+            if result != 0:
+                return []
+            break
+
+        servers = []
+        adapter = ctypes.cast(buffer, ctypes.POINTER(IP_ADAPTER_ADDRESSES))
+        while adapter:
+            dns = adapter.contents.FirstDnsServerAddress
+            while dns:
+                sockaddr = dns.contents.Address.lpSockaddr
+                if sockaddr:
+                    raw = ctypes.string_at(sockaddr, dns.contents.Address.iSockaddrLength)
+                    family = sockaddr.contents.sa_family
+                    if family == socket.AF_INET:
+                        servers.append(socket.inet_ntop(socket.AF_INET, raw[4:8]))
+                    elif family == socket.AF_INET6:
+                        servers.append(socket.inet_ntop(socket.AF_INET6, raw[8:24]))
+                dns = dns.contents.Next
+            adapter = adapter.contents.Next
+
+        # Varios adaptadores suelen repetir los mismos servidores
+        return list(dict.fromkeys(servers))
+
     async def _get_dns_configuration(self) -> Dict[str, Any]:
         dns_config = {}
-        
+
+        if sys.platform == 'win32':
+            try:
+                dns_servers = self._get_dns_servers_native()
+                if dns_servers:
+                    return {
+                        'primary_dns_address': dns_servers[0],
+                        'dns_servers': dns_servers
+                    }
+            except Exception as e:
+                self.logger.debug(f"IP Helper API no disponible, usando comandos: {str(e)}")
+
+        # Fallback: parseo de nslookup/ipconfig para plataformas sin la API
         try:
-            result = subprocess.run([
-                'nslookup', 'localhost'
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode == 0:
-                lines = result.stdout.split('\n')
-                for line in lines:
+            returncode, stdout = await self._run_command(['nslookup', 'localhost'], 10)
+
+            if returncode == 0:
+                for line in io.StringIO(stdout):
                     if 'Server:' in line:
                         dns_config['primary_dns'] = line.split(':')[1].strip()
                     elif 'Address:' in line and '#53' in line:
                         dns_config['primary_dns_address'] = line.split(':')[1].replace('#53', '').strip()
-            
-            result = subprocess.run([
-                'ipconfig', '/all'
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
+                    # Ambos campos vienen al inicio de la salida: cortar
+                    # aquí ahorra recorrer el resto del buffer
+                    if 'primary_dns' in dns_config and 'primary_dns_address' in dns_config:
+                        break
+
+            returncode, stdout = await self._run_command(['ipconfig', '/all'], 30)
+
+            if returncode == 0:
                 dns_servers = []
-                lines = result.stdout.split('\n')
-                
-                for line in lines:
+
+                for line in io.StringIO(stdout):
                     line = line.strip()
                     if 'DNS Servers' in line:
                         if ':' in line:
@@ -236,15 +506,14 @@ class NetworkScanner:
         firewall_status = {}
         
         try:
-            result = subprocess.run([
-                'netsh', 'advfirewall', 'show', 'allprofiles', 'state'
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                lines = result.stdout.split('\n')
+            returncode, stdout = await self._run_command(
+                ['netsh', 'advfirewall', 'show', 'allprofiles', 'state'], 30
+            )
+
+            if returncode == 0:
                 current_profile = None
-                
-                for line in lines:
+
+                for line in io.StringIO(stdout):
                     line = line.strip()
                     
                     if 'Profile' in line and 'Settings' in line:
@@ -263,35 +532,47 @@ class NetworkScanner:
         wifi_networks = []
         
         try:
-            result = subprocess.run([
-                'netsh', 'wlan', 'show', 'profiles'
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                lines = result.stdout.split('\n')
-                
-                for line in lines:
-                    if 'All User Profile' in line:
-                        profile_name = line.split(':')[1].strip()
-                        
-                        detail_result = subprocess.run([
-                            'netsh', 'wlan', 'show', 'profile', profile_name, 'key=clear'
-                        ], capture_output=True, text=True, timeout=10)
-                        
-                        if detail_result.returncode == 0:
-                            detail_lines = detail_result.stdout.split('\n')
-                            network_info = {'name': profile_name}
-                            
-                            for detail_line in detail_lines:
-                                detail_line = detail_line.strip()
-                                if 'Authentication' in detail_line:
-                                    network_info['authentication'] = detail_line.split(':')[1].strip()
-                                elif 'Cipher' in detail_line:
-                                    network_info['cipher'] = detail_line.split(':')[1].strip()
-                                elif 'Key Content' in detail_line:
-                                    network_info['has_saved_password'] = True
-                            
-                            wifi_networks.append(network_info)
+            returncode, stdout = await self._run_command(['netsh', 'wlan', 'show', 'profiles'], 30)
+
+            if returncode == 0:
+                profile_names = [
+                    line.split(':')[1].strip()
+                    for line in io.StringIO(stdout)
+                    if 'All User Profile' in line
+                ]
+
+                # Cada netsh por perfil cuesta ~100-300 ms de arranque de
+                # proceso: lanzarlos todos a la vez convierte el recorrido
+                # serial en una sola espera del más lento
+                details = await asyncio.gather(
+                    *[
+                        self._run_command(
+                            ['netsh', 'wlan', 'show', 'profile', name, 'key=clear'], 10
+                        )
+                        for name in profile_names
+                    ],
+                    return_exceptions=True
+                )
+
+                for profile_name, detail in zip(profile_names, details):
+                    if isinstance(detail, Exception):
+                        self.logger.debug(f"Error consultando perfil {profile_name}: {detail}")
+                        continue
+
+                    detail_returncode, detail_stdout = detail
+                    if detail_returncode == 0:
+                        network_info = {'name': profile_name}
+
+                        for detail_line in io.StringIO(detail_stdout):
+                            detail_line = detail_line.strip()
+                            if 'Authentication' in detail_line:
+                                network_info['authentication'] = detail_line.split(':')[1].strip()
+                            elif 'Cipher' in detail_line:
+                                network_info['cipher'] = detail_line.split(':')[1].strip()
+                            elif 'Key Content' in detail_line:
+                                network_info['has_saved_password'] = True
+
+                        wifi_networks.append(network_info)
             
             return wifi_networks
             
@@ -303,14 +584,10 @@ class NetworkScanner:
         shares = []
         
         try:
-            result = subprocess.run([
-                'net', 'share'
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                lines = result.stdout.split('\n')
-                
-                for line in lines:
+            returncode, stdout = await self._run_command(['net', 'share'], 30)
+
+            if returncode == 0:
+                for line in io.StringIO(stdout):
                     line = line.strip()
                     if line and not line.startswith('-') and not 'Share name' in line:
                         parts = line.split()
@@ -54,6 +54,10 @@ CREATE TABLE machines (
     user_id UUID UNIQUE REFERENCES users(id) ON DELETE SET NULL,
     hardware_id VARCHAR(255) UNIQUE NOT NULL,
     hostname VARCHAR(255),
+    -- Agregados denormalizados, mantenidos al recibir cada escaneo
+    scan_count INTEGER NOT NULL DEFAULT 0,
+    last_seen TIMESTAMPTZ,
+    last_status VARCHAR(50),
     inventory_data JSONB, -- Guarda datos estáticos: SO, CPU, RAM total, software
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
@@ -64,6 +68,7 @@ CREATE TABLE scans (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     machine_id UUID NOT NULL REFERENCES machines(id) ON DELETE CASCADE,
     scan_timestamp TIMESTAMPTZ NOT NULL,
+    threats_detected INTEGER NOT NULL DEFAULT 0, -- Fijado al ingestar el escaneo
     performance_data JSONB, -- Guarda datos volátiles: %CPU, %RAM, etc.
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
@@ -82,5 +87,11 @@ CREATE TABLE threats (
 
 -- Crear índices para acelerar las consultas comunes
 CREATE INDEX idx_machines_manager_id ON machines(manager_id);
+CREATE UNIQUE INDEX ux_machines_manager_hostname ON machines(manager_id, hostname);
 CREATE INDEX idx_scans_machine_id ON scans(machine_id);
-CREATE INDEX idx_threats_machine_id ON threats(machine_id);
\ No newline at end of file
+CREATE INDEX idx_threats_machine_id ON threats(machine_id);
+
+-- Índices compuestos para los filtros del dashboard
+CREATE INDEX idx_scans_machine_ts ON scans(machine_id, scan_timestamp DESC);
+CREATE INDEX idx_threats_detected_at ON threats(detected_at);
+CREATE INDEX idx_threats_machine_detected ON threats(machine_id, detected_at DESC);
\ No newline at end of file